@@ -0,0 +1,169 @@
+"""Solution of the Bateman equations dN/dt = M N over the decay chains
+of a decay graph (see decay_graph.py), for many nuclides and many time
+points at once.
+
+The nuclides reached from the parents are put in topological order, so
+that M is lower triangular and its eigenvalues are minus the decay
+constants. Its eigenvectors are built with the Bateman recurrence as a
+sparse matrix V, and the amounts on a whole time grid are then
+V exp(-lambda t) V^-1 N0, a single sparse by dense product. Widely
+separated half-lives (stiff chains) are harmless in this form, since
+the short-lived terms just vanish, while the matrix exponential of M
+loses accuracy. Equal decay constants are not, as the recurrence
+divides by their differences: constants closer than
+DEGENERACY_TOLERANCE (relative) are split apart by that much, far
+below the uncertainty of any half-life.
+"""
+import numpy as np
+
+DEGENERACY_TOLERANCE = 1e-8  # relative difference under which decay constants are equal
+
+
+def decay_constants(half_lives):
+    """Decay constants in 1/s of the half-lives in s, 0 for the stable
+    (inf) or unknown (nan) ones
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        constants = np.log(2) / np.asarray(half_lives, dtype='f8')
+    return np.where(np.isfinite(constants), constants, 0.)
+
+
+def split_degenerate(constants, tolerance=DEGENERACY_TOLERANCE):
+    """Copy of the decay constants where those closer than tolerance
+    (relative) to a smaller one are increased to 2 tolerance above it
+    """
+    constants = np.array(constants, dtype='f8')
+    previous = 0.
+    for k in np.argsort(constants, kind='mergesort'):
+        if constants[k] > 0:
+            if constants[k] <= previous * (1 + tolerance):
+                constants[k] = previous * (1 + 2 * tolerance)
+            previous = constants[k]
+    return constants
+
+
+def branching_fractions(graph):
+    """Branching ratios of the edges of the graph, with the unknown
+    (nan) ones of each nuclide sharing what the known ones leave to 1
+    """
+    fractions = graph.branching.copy()
+    for row in np.nonzero(np.diff(graph.indptr))[0]:
+        edges = fractions[graph.indptr[row]:graph.indptr[row + 1]]
+        missing = np.isnan(edges)
+        if missing.any():
+            edges[missing] = max(0., 1. - edges[~missing].sum()) / missing.sum()
+    return fractions
+
+
+def _topological_order(children):
+    """Kahn's algorithm over the lists of children of each node. Nodes
+    in loops (inconsistent data) are put last.
+    """
+    n = len(children)
+    indegree = np.zeros(n, dtype=int)
+    for row_children in children:
+        for child in row_children:
+            indegree[child] += 1
+    order = [row for row in range(n) if indegree[row] == 0]
+    k = 0
+    while k < len(order):
+        for child in children[order[k]]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                order.append(child)
+        k += 1
+    return order + sorted(set(range(n)) - set(order))
+
+
+class decay_solver(object):
+    """Bateman solver over the decay chains of the parents (nuclide ids)
+    in a decay graph. The amounts and activities are computed for the
+    nuclides in self.nodes, every nuclide reached from the parents.
+    """
+    def __init__(self, graph, parents):
+        from scipy import sparse
+
+        rows = graph.index(parents)
+        rows = rows[rows >= 0]
+        reach = graph.descendants_batch(graph.nodes[rows])
+        members = np.union1d(rows, reach.indices).astype(int)
+
+        weights = sparse.csr_matrix((branching_fractions(graph), graph.indices, graph.indptr),
+                                    shape=(len(graph), len(graph)))
+        weights = weights[members][:, members]
+        children = np.split(weights.indices, weights.indptr[1:-1])
+        order = _topological_order(children)
+
+        self.nodes = graph.nodes[members[order]]
+        self.decay_constants = split_degenerate(decay_constants(graph.half_lives[members[order]]))
+        # edges against the order only come from loops, which are cut
+        weights = sparse.triu(weights[order][:, order], k=1).tocsr()
+        # M[j, k] = lambda_k * branching k -> j, without the diagonal
+        self.feeding = weights.T.dot(sparse.diags(self.decay_constants)).tocsr()
+        self.eigenvectors = self._eigenvectors()
+
+    def _eigenvectors(self):
+        """Builds the eigenvectors V (unit lower triangular), column i
+        being the eigenvector of -lambda_i, with the Bateman recurrence
+        V[j, i] = sum_k M[j, k] V[k, i] / (lambda_j - lambda_i)
+        computed a row at a time, in topological order
+        """
+        from scipy import sparse
+
+        constants = self.decay_constants
+        feeding = self.feeding
+        columns, values = [], []
+        for j in range(len(self.nodes)):
+            edges = slice(feeding.indptr[j], feeding.indptr[j + 1])
+            parents, weights = feeding.indices[edges], feeding.data[edges]
+            if len(parents):
+                index = np.concatenate([columns[k] for k in parents])
+                fed = np.concatenate([w * values[k] for k, w in zip(parents, weights)])
+                if len(parents) > 1:
+                    index, inverse = np.unique(index, return_inverse=True)
+                    fed = np.bincount(inverse, fed)
+                nonzero = fed != 0
+                index, fed = index[nonzero], fed[nonzero]
+                columns.append(np.append(index, j))
+                values.append(np.append(fed / (constants[j] - constants[index]), 1.))
+            else:
+                columns.append(np.array([j]))
+                values.append(np.ones(1))
+
+        n = len(self.nodes)
+        indptr = np.cumsum([0] + [len(row) for row in columns])
+        return sparse.csr_matrix((np.concatenate(values), np.concatenate(columns), indptr),
+                                 shape=(n, n)).tocsc()
+
+    def _initial_vector(self, initial):
+        """initial is either a dict {nuclide id: amount} or an array of
+        amounts of self.nodes
+        """
+        if isinstance(initial, dict):
+            amounts = np.zeros(len(self.nodes))
+            index = dict((nid, k) for k, nid in enumerate(self.nodes))
+            for nid, amount in initial.items():
+                amounts[index[nid]] = amount
+            return amounts
+        return np.asarray(initial, dtype='f8')
+
+    def amounts(self, initial, times):
+        """Amounts of the nuclides self.nodes (columns) at each time in s
+        (rows), from the initial amounts (see _initial_vector)
+        """
+        from scipy.sparse.linalg import spsolve
+
+        initial = self._initial_vector(initial)
+        times = np.atleast_1d(np.asarray(times, dtype='f8'))
+        coefficients = np.atleast_1d(spsolve(self.eigenvectors, initial))
+        used = np.nonzero(coefficients)[0]
+        terms = np.exp(-np.outer(self.decay_constants[used], times)) * coefficients[used, None]
+        amounts = self.eigenvectors[:, used].dot(terms).T
+        # the cancellations of the sum leave round-off negatives
+        return np.maximum(amounts, 0.)
+
+    def activities(self, initial, times):
+        """Activities in Bq of the nuclides self.nodes (columns) at each
+        time in s (rows), for initial amounts in atoms
+        """
+        return self.amounts(initial, times) * self.decay_constants
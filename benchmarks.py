@@ -0,0 +1,374 @@
+"""Benchmarks of the parsing functions in my_ensdf_parser.py
+run on synthetic ENSDF records, and timings of each stage of the
+parser on synthetic ENSDF files (see synthetic_ensdf.py), written as
+JSON to track regressions between versions:
+
+    python benchmarks.py [results.json] [previous_results.json]
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import platform
+import tempfile
+from collections import Counter
+from timeit import default_timer
+
+import numpy as np
+
+from my_ensdf_parser import (END_RECORD, EXTRACTION_PLANS, _DSID_HEADERS, classify_dataset,
+                             classify_record, classify_records, dataset, iter_dataset_strings,
+                             iter_datasets, parse_dsid, record_group, validate_records)
+from syntax_presets import RECORD_MEMBERS, FIELDS, field_converters
+from synthetic_ensdf import synthetic_ensdf, DATASET_MIX, RECORD_MIX
+from parse_cache import PARSER_VERSION
+
+RESULTS_FILENAME = 'benchmarks.json'
+REGRESSION_THRESHOLD = 1.1  # slowdown ratio flagged by compare_results
+
+# Templates of records as found in the ENSDF files, the record
+# identifier (columns 6-9) is written over them
+SYNTHETIC_RECORDS = [
+    (' 60NI    60CO B- DECAY (5.2714 Y)      1978AL17                  13NDS    201307', 1),
+    (' 60NI  H TYP=FUL$AUT=E. BROWNE, J. K. TULI$CIT=NDS 114, 1849 (2013)$           ', 2),
+    (' 60NI2 H CUT=1-Mar-2013$                                                        ', 1),
+    (' 60NI  L 1332.514  4 2+                0.90 PS   3                              ', 20),
+    (' 60NI  G 1332.492  4 99.9826 6 E2                         1.28E-4               ', 30),
+    (' 60NI  B 317.88   10 99.88   3          7.512  1                                ', 3),
+    (' 60NI  E 317.88   10 99.88   3 0.12   3 7.512  1                                ', 3),
+    (' 60NI  A 4512.3   10 99.88   3 1.2    2                                         ', 1),
+    (' 60NI  D 3230     30 0.2     1                                                  ', 1),
+    (' 60NI c  E$From 1978AL17                                                        ', 10),
+    (' 60NI cG E$From 1978AL17                                                        ', 10),
+    (' 60NI2cL J$From 1978AL17                                                        ', 5),
+    (' 60CO  P 0.0         5+                5.2714 Y  5              2822.81   21    ', 1),
+    (' 60NI  N 1.0         1.0       1.0                                              ', 1),
+    (' 60NI PN                                                                     6  ', 1),
+    (' 60NI  Q -2822.81  21 11387.6 4 9532.6  4 -6293.4 5  2012WA38                   ', 1),
+    (' 60NI  X A 60CO B- DECAY (5.2714 Y)                                             ', 1),
+    ('  60   R 1978AL17  JOUR PRVCA 18 1234                                           ', 1),
+    (' 52FE   P1590      30100     AP                                                 ', 1),
+    (END_RECORD[:-1], 1),
+]
+
+def synthetic_lines(n_lines, seed=0):
+    """Returns a list of n_lines records (with line ending) drawn
+    from SYNTHETIC_RECORDS according to their weights
+    """
+    rng = random.Random(seed)
+    population = []
+    for record, weight in SYNTHETIC_RECORDS:
+        population.extend(weight * [record + u'\n'])
+    return [rng.choice(population) for _ in range(n_lines)]
+
+def write_synthetic_file(filename, n_lines, seed=0):
+    """Writes a synthetic ENSDF file with n_lines records"""
+    with open(filename, 'w') as f:
+        f.writelines(synthetic_lines(n_lines, seed))
+
+def _classify_record_loop(record_string):
+    """The per-line loop formerly used in classify_record, kept
+    as reference for the benchmarks
+    """
+    record_type = None
+    for key, val in FIELDS['RID'].items():
+        if record_string[5:8] == val:
+            record_type = key
+
+    if record_type is None:
+        if record_string[6] in ['c', 'd', 't', 'C', 'D', 'T']:
+            record_type = 'COMMENT'
+        elif record_string == END_RECORD:
+            record_type = 'END'
+        elif record_string[6:9] == 3 * r' ':
+            record_type = 'IDENTIFICATION'
+
+    return record_type
+
+def _populate_data_loop(record):
+    """The per-field loop formerly used in record_group._populate_data,
+    kept as reference for the benchmarks
+    """
+    rtype = record.type
+    for fieldname, limit_pos in RECORD_MEMBERS[rtype].items():
+        i1, i2 = limit_pos[0] - 1, limit_pos[1]
+        substring = record.record_raw[i1:i2]
+        if fieldname in field_converters:
+            regex = r'|'.join(FIELDS[fieldname])
+            match = re.search(regex, substring)
+            if match:
+                value = field_converters[fieldname](*match.groups())
+            else:
+                value = None
+            record.__setattr__(fieldname, value)
+        else:
+            record.__setattr__(fieldname, substring)
+
+def _populate_per_field(record):
+    """The extraction plan with a search of the format of every
+    converted field, as record_group._populate_data did before taking
+    plain numbers as they are, kept as reference for the benchmarks
+    """
+    attributes, record_raw = record.__dict__, record.record_raw
+    for fieldname, i1, i2, search, converter in EXTRACTION_PLANS.get(record.type, ()):
+        substring = record_raw[i1:i2]
+        if converter is None:
+            attributes[fieldname] = substring
+        elif substring.isspace():
+            attributes[fieldname] = None
+        else:
+            match = search(substring)
+            attributes[fieldname] = converter(*match.groups()) if match else None
+
+def _timed(func, *args):
+    start = default_timer()
+    result = func(*args)
+    return default_timer() - start, result
+
+def bench_classify_record(n_lines=1000000):
+    """Times the record classification of a synthetic file
+    of n_lines records, comparing the reference loop against
+    classify_record and classify_records.
+    Returns a dict with the timings in seconds.
+    """
+    fd, filename = tempfile.mkstemp(prefix='ensdf.')
+    os.close(fd)
+    try:
+        write_synthetic_file(filename, n_lines)
+        with open(filename, 'r') as f:
+            lines = f.readlines()
+    finally:
+        os.remove(filename)
+
+    t_loop, reference = _timed(lambda ls: [_classify_record_loop(l) for l in ls], lines)
+    t_single, single = _timed(lambda ls: [classify_record(l) for l in ls], lines)
+    t_batch, batch = _timed(classify_records, lines)
+    assert reference == single == batch, 'Classifiers disagree!'
+
+    return {
+        'lines'            : n_lines,
+        'loop'             : t_loop,
+        'classify_record'  : t_single,
+        'classify_records' : t_batch,
+        'speedup'          : t_loop / t_batch,
+    }
+
+def bench_populate_data(n_records=20000):
+    """Times the field extraction of n_records records of each
+    record type in SYNTHETIC_RECORDS, comparing the reference loop
+    and the search of every field (see _populate_per_field) against
+    record_group._populate_data.
+    Returns a dict with the timings in seconds by record type.
+    """
+    results = {}
+    for record, _ in SYNTHETIC_RECORDS:
+        record = record + u'\n'
+        rtype = classify_record(record)
+        if rtype in [None, 'END'] or rtype in results:
+            continue
+
+        rg = record_group(record, recordstype=rtype)
+        reference = dict(rg.__dict__)
+        t_loop, _ = _timed(lambda: [_populate_data_loop(rg) for _ in range(n_records)])
+        assert rg.__dict__ == reference, 'Extractions disagree for {}!'.format(rtype)
+        t_field, _ = _timed(lambda: [_populate_per_field(rg) for _ in range(n_records)])
+        assert rg.__dict__ == reference, 'Extractions disagree for {}!'.format(rtype)
+        t_plan, _ = _timed(lambda: [rg._populate_data() for _ in range(n_records)])
+        assert rg.__dict__ == reference, 'Extractions disagree for {}!'.format(rtype)
+
+        results[rtype] = {
+            'records'   : n_records,
+            'loop'      : t_loop,
+            'per_field' : t_field,
+            'plan'      : t_plan,
+            'speedup'   : t_loop / t_plan,
+        }
+
+    return results
+
+def _best_of(repeat, func, *args):
+    """Smallest time of repeat calls of func, and its last result"""
+    times = []
+    for _ in range(repeat):
+        elapsed, result = _timed(func, *args)
+        times.append(elapsed)
+    return min(times), result
+
+def _stage(seconds, items):
+    return {'seconds': seconds, 'items': items, 'per_second': items / seconds if seconds else None}
+
+def _lazy_datasets(strings):
+    return [dataset(dataset_string, None, lazy=True) for dataset_string in strings]
+
+def _populate_all(datasets, populate=record_group._populate_data):
+    for ds in datasets:
+        for record in ds.records:
+            populate(record)
+
+def _parse_dsids(dsids):
+    _DSID_HEADERS.clear()  # time the parsing, not the memo
+    return [parse_dsid(dsid) for dsid in dsids]
+
+def _converter_arguments(datasets):
+    """The matched groups of every converted field of the records of
+    the datasets, by converter
+    """
+    arguments = {}
+    for ds in datasets:
+        for record in ds.records:
+            for fieldname, i1, i2, search, converter in EXTRACTION_PLANS.get(record.type, ()):
+                substring = record.record_raw[i1:i2]
+                if converter is None or substring.isspace():
+                    continue
+                match = search(substring)
+                if match:
+                    arguments.setdefault(converter, []).append(match.groups())
+    return arguments
+
+def _convert_all(converter, arguments):
+    for args in arguments:
+        converter(*args)
+
+def bench_stages(size=10000000, path=None, repeat=3, seed=0, dataset_mix=DATASET_MIX,
+                 record_mix=RECORD_MIX):
+    """Times each stage of the parser on an ENSDF file: splitting into
+    datasets, classify_record, building the (lazy) datasets from their
+    strings and from the buffer of the file (iter_datasets),
+    record_group._populate_data (and the search of every field it
+    replaced, see _populate_per_field), classify_dataset, parse_dsid
+    (without and with its memo), each of the field converters and the
+    validator mode. Each time is the best of repeat.
+
+    Arguments:
+    ---------
+    size: {int} size in bytes of the synthetic file benchmarked
+    path: {str} an ENSDF file to benchmark instead of a synthetic one
+    repeat: {int} number of runs of each stage
+    seed, dataset_mix, record_mix: see synthetic_ensdf
+
+    Returns a dict ready for JSON, with the versions, the input and
+    the stages, each with its time in seconds and items per second.
+    """
+    synthetic = path is None
+    if synthetic:
+        fd, path = tempfile.mkstemp(prefix='ensdf.')
+        with os.fdopen(fd, 'w') as f:
+            f.write(synthetic_ensdf(size, dataset_mix=dataset_mix, record_mix=record_mix, seed=seed))
+
+    try:
+        stages = {}
+        t, offsets_strings = _best_of(repeat, lambda: list(iter_dataset_strings(path)))
+        strings = [dataset_string for _, dataset_string in offsets_strings]
+        stages['split'] = _stage(t, len(strings))
+
+        lines = [line + u'\n' for dataset_string in strings for line in dataset_string.split(u'\n')]
+        t, _ = _best_of(repeat, lambda: [classify_record(line) for line in lines])
+        stages['classify_record'] = _stage(t, len(lines))
+
+        t, datasets = _best_of(repeat, _lazy_datasets, strings)
+        stages['lazy_datasets'] = _stage(t, len(datasets))
+
+        # both at once on the buffer of the file, as the parser does
+        t, _ = _best_of(repeat, lambda: list(iter_datasets(path, lazy=True)))
+        stages['iter_datasets'] = _stage(t, len(datasets))
+
+        records = sum(len(ds.records) for ds in datasets)
+        times = []
+        for _ in range(repeat):
+            fresh = _lazy_datasets(strings)
+            times.append(_timed(_populate_all, fresh)[0])
+        stages['populate_data'] = _stage(min(times), records)
+
+        times = []
+        for _ in range(repeat):
+            fresh = _lazy_datasets(strings)
+            times.append(_timed(_populate_all, fresh, _populate_per_field)[0])
+        stages['populate_data.per_field'] = _stage(min(times), records)
+
+        dsids = [ds.records[0].DSID for ds in datasets]
+        t, _ = _best_of(repeat, lambda: [classify_dataset(dsid) for dsid in dsids])
+        stages['classify_dataset'] = _stage(t, len(dsids))
+        t, _ = _best_of(repeat, _parse_dsids, dsids)
+        stages['parse_dsid'] = _stage(t, len(dsids))
+        t, _ = _best_of(repeat, lambda: [parse_dsid(dsid) for dsid in dsids])
+        stages['parse_dsid.memoized'] = _stage(t, len(dsids))
+
+        for converter, arguments in sorted(_converter_arguments(datasets).items(),
+                                           key=lambda item: item[0].__name__):
+            t, _ = _best_of(repeat, _convert_all, converter, arguments)
+            stages['field_converters.' + converter.__name__] = _stage(t, len(arguments))
+
+        t, problems = _best_of(repeat, lambda: list(validate_records(path)))
+        stages['validate_records'] = _stage(t, len(lines))
+
+        record_types = Counter(str(record.type) for ds in datasets for record in ds.records)
+        size = os.path.getsize(path)
+    finally:
+        if synthetic:
+            os.remove(path)
+
+    stages['total_parse'] = _stage(sum(stages[name]['seconds'] for name in
+                                       ['split', 'lazy_datasets', 'populate_data']), size)
+    return {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'versions': {
+            'parser': PARSER_VERSION,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+        },
+        'input': {
+            'file': None if synthetic else path,
+            'seed': seed if synthetic else None,
+            'bytes': size,
+            'lines': len(lines),
+            'datasets': len(datasets),
+            'records': dict(record_types),
+            'problems': len(problems),
+        },
+        'stages': stages,
+    }
+
+def write_results(results, path=RESULTS_FILENAME):
+    """Writes benchmark results as JSON"""
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+
+def compare_results(previous, results, threshold=REGRESSION_THRESHOLD):
+    """Stages of results (dicts of bench_stages, or paths of their JSON
+    files) slower than in previous by more than the ratio threshold.
+    Returns a dict stage -> ratio of the times.
+    """
+    if not isinstance(previous, dict):
+        with open(previous) as f:
+            previous = json.load(f)
+    if not isinstance(results, dict):
+        with open(results) as f:
+            results = json.load(f)
+
+    regressions = {}
+    for name, stage in results['stages'].items():
+        before = previous['stages'].get(name)
+        if before and before['seconds'] and stage['seconds'] > threshold * before['seconds']:
+            regressions[name] = stage['seconds'] / before['seconds']
+    return regressions
+
+
+if __name__ == "__main__":
+    results_path = sys.argv[1] if len(sys.argv) > 1 else RESULTS_FILENAME
+
+    results = bench_stages()
+    results['classify_record_loop'] = bench_classify_record()
+    results['populate_data_loop'] = bench_populate_data()
+    write_results(results, results_path)
+
+    print('{:>40}  {:>8} {:>12}'.format('stage', 'seconds', 'items/s'))
+    for name, stage in sorted(results['stages'].items()):
+        print('{:>40}: {seconds:8.4f} {per_second:12.4g}'.format(name, **stage))
+    print('results written to {}'.format(results_path))
+
+    if len(sys.argv) > 2:
+        for name, ratio in sorted(compare_results(sys.argv[2], results).items()):
+            print('REGRESSION {}: {:.2f} times slower'.format(name, ratio))
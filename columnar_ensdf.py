@@ -0,0 +1,271 @@
+"""Columnar representation of the ENSDF datasets. Instead of a
+record_group object per record, the records of each type are
+stored in a NumPy structured array with a column per field in
+RECORD_MEMBERS, and dataset.records is served by lightweight
+views into those arrays.
+"""
+import numpy as np
+
+from my_ensdf_parser import (END_RECORD, EXTRACTION_PLANS, classify_records,
+                             get_atomic_number, parse_dsid, is_dataset)
+from field_converters import convert_energy, batch_converters
+from warnings import warn
+
+ENCODING = 'latin-1'  # ENSDF is ASCII, this only guards against stray characters
+
+# Columns added to every record table, besides the record fields
+RECORD_INDEX_COLUMNS = [
+    ('line',   'i4'),  # index of the first line of the record in the dataset
+    ('nlines', 'i2'),  # number of lines (1 + continuation records)
+    ('A',      'i2'),  # mass number, 0 for END records
+    ('elem',   'S2'),  # element symbol as in the NUCID
+]
+
+
+def _record_dtype(rtype):
+    columns = list(RECORD_INDEX_COLUMNS)
+    plan = EXTRACTION_PLANS.get(rtype, ())
+    for fieldname, i1, i2, search, converter in sorted(plan, key=lambda p: (p[1], p[0])):
+        if converter is convert_energy:
+            columns.append((fieldname, 'c16'))
+        elif converter is not None:
+            columns.append((fieldname, 'f8'))
+        else:
+            columns.append((fieldname, 'S{}'.format(i2 - i1)))
+    return np.dtype(columns)
+
+# dtypes are shared by all the tables of a record type
+RECORD_DTYPES = dict((rtype, _record_dtype(rtype)) for rtype in list(EXTRACTION_PLANS) + [None])
+
+def record_dtype(rtype):
+    """Returns the NumPy dtype of the table of records of type rtype.
+    Fields converted by field_converters are stored as numbers (complex
+    for E, see convert_energy, float otherwise) with NaN for missing
+    values, and the rest as fixed-width byte strings.
+    """
+    return RECORD_DTYPES[rtype]
+
+
+def _encode(string):
+    return string.encode(ENCODING, 'replace')
+
+def build_record_table(rtype, records):
+    """Builds the structured array of records of type rtype.
+
+    Arguments:
+    ---------
+    rtype: {str} the record type, a key of RECORD_MEMBERS or None
+    records: {list} tuples (line, nlines, record_string) with the index
+             of the first line of each record, its number of lines and
+             its first line (80 character string)
+    """
+    table = np.zeros(len(records), dtype=record_dtype(rtype))
+    if not records:
+        return table
+
+    lines, nlines, strings = zip(*records)
+    table['line'] = lines
+    table['nlines'] = nlines
+
+    # the fields are cut as columns of the matrix of record characters
+    raw = np.array([_encode(s[:80]) for s in strings], dtype='S80')
+    chars = raw.view('u1').reshape(len(raw), 80)
+    def column(i1, i2):
+        return np.ascontiguousarray(chars[:, i1:i2]).view('S{}'.format(i2 - i1)).ravel()
+
+    if rtype != 'END':
+        table['A'] = column(0, 3).astype(int)
+    table['elem'] = column(3, 5)
+
+    for fieldname, i1, i2, search, converter in EXTRACTION_PLANS.get(rtype, ()):
+        if converter is None:
+            table[fieldname] = column(i1, i2)
+        else:
+            table[fieldname] = batch_converters[converter](column(i1, i2), search)[0]
+
+    return table
+
+
+class record_view(object):
+    """A lightweight view of a row of a record table, exposing the
+    same attributes as a record_group
+    """
+    __slots__ = ('dataset', 'type', 'row')
+
+    def __init__(self, dataset, rtype, row):
+        self.dataset = dataset
+        self.type = rtype
+        self.row = row
+
+    @property
+    def record_raw(self):
+        entry = self.dataset.tables[self.type][self.row]
+        return self.dataset.raw_lines(entry['line'], entry['nlines'])
+
+    def __getattr__(self, name):
+        table = self.dataset.tables[self.type]
+        if name not in table.dtype.names:
+            raise AttributeError(name)
+
+        value = table[name][self.row]
+        if isinstance(value, bytes):
+            return value.decode(ENCODING)
+        elif name in ['line', 'nlines', 'A']:
+            return int(value)
+        elif np.isnan(value):
+            return None
+        elif isinstance(value, np.complexfloating) and value.imag == 0:
+            return float(value.real)
+        else:
+            return value.item()
+
+    def __iter__(self):
+        names = self.dataset.tables[self.type].dtype.names
+        for attr in names[len(RECORD_INDEX_COLUMNS):]:
+            yield attr, getattr(self, attr)
+
+
+class record_views(object):
+    """The sequence of records of a columnar_dataset in file order,
+    views are created on access
+    """
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset.order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[k] for k in range(*index.indices(len(self)))]
+
+        rtype_code, row = self.dataset.order[index]
+        return record_view(self.dataset, self.dataset.record_types[rtype_code], row)
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+
+class columnar_dataset(object):
+    """A dataset of ENSDF, as the class dataset in my_ensdf_parser.py,
+    where the records are kept in the structured arrays of `tables`
+    (one per record type), and `records` lists views into them
+    """
+
+    def __init__(self, dataset_string, loc):
+        """Receives the string representing the dataset, which should
+        be composed of 2 or more lines (`records` in the ENSDF manual),
+        and builds the tables of records by type.
+
+        Arguments:
+        ---------
+        dataset_string: {str} the dataset, a collection of 80char lines
+        """
+        if not is_dataset(dataset_string):
+            warn('The argument dataset_string does not have a `dataset` structure!')
+
+        self.location = loc
+        self.dataset_raw = dataset_string
+
+        rs_lines_list = self.dataset_raw.split(u'\n')
+        self.line_starts = np.cumsum([0] + [len(l) + 1 for l in rs_lines_list], dtype='i8')
+
+        # group records as done in dataset.__init__
+        new_records = [rec + u'\n' if rec else END_RECORD for rec in rs_lines_list]
+        new_types = classify_records(new_records)
+        groups = {}
+        order = []
+
+        prev_type = 'IDENTIFICATION'  # all datasets start with this record type
+        prev_record = new_records[0]
+        first_line, nlines = 0, 1
+        for k in range(1, len(new_records)):
+            new_record, new_type = new_records[k], new_types[k]
+            if (new_type == prev_type) and (new_record[5] > prev_record[5]):
+                nlines += 1
+            else:
+                rows = groups.setdefault(prev_type, [])
+                order.append((prev_type, len(rows)))
+                rows.append((first_line, nlines, prev_record))
+                prev_type = new_type
+                prev_record = new_record
+                first_line, nlines = k, 1
+
+        self.record_types = sorted(groups, key=str)
+        self.tables = dict((rtype, build_record_table(rtype, rows)) for rtype, rows in groups.items())
+        codes = dict((rtype, k) for k, rtype in enumerate(self.record_types))
+        self.order = np.array([(codes[rtype], row) for rtype, row in order], dtype='i4').reshape(-1, 2)
+        self.records = record_views(self)
+
+        self.A = int(rs_lines_list[0][:3].strip())
+        self.elem = rs_lines_list[0][3:5].strip()
+        self.Z = get_atomic_number(self.elem)
+
+        self.header = parse_dsid(self.records[0].DSID)
+        self.type = self.header.type
+
+    def first_record(self, rtype):
+        """The first record of type rtype of the dataset, None if none"""
+        if len(self.tables.get(rtype, ())):
+            return record_view(self, rtype, 0)
+        return None
+
+    @property
+    def level_scheme(self):
+        """The level scheme of the dataset (see level_scheme.py), built
+        on first access
+        """
+        if '_level_scheme' not in self.__dict__:
+            from level_scheme import level_scheme
+            self._level_scheme = level_scheme(self)
+        return self._level_scheme
+
+    def raw_lines(self, line, nlines=1):
+        """Returns the lines [line, line + nlines) of the dataset
+        as a string, each with its line ending
+        """
+        return self.dataset_raw[self.line_starts[line]:self.line_starts[line + nlines]]
+
+
+class columnar_file(object):
+    """A class to represent and contain the information of
+    a file in the format of ENSDF as columnar datasets
+    """
+    def __init__(self, ensdf):
+        self.filename = ensdf.name
+
+        self.datasets = []
+        split_datasets = ensdf.value.split(END_RECORD)
+        for dataset_string in split_datasets:
+            if dataset_string == u'':
+                # EOF reached
+                continue
+
+            self.datasets.append(columnar_dataset(dataset_string, None))
+
+
+def stack_tables(datasets, rtype):
+    """Concatenates the tables of records of type rtype of all datasets
+    into a single structured array, with an additional column `dataset`
+    holding the index of the dataset in the sequence datasets. Useful
+    for vectorized filters over a whole file or library, e.g.
+
+        gammas = stack_tables(ef.datasets, 'GAMMA')
+        strong = gammas[gammas['RI'] > 50]
+    """
+    dtype = np.dtype(record_dtype(rtype).descr + [('dataset', 'i4')])
+    tables = []
+    for k, ds in enumerate(datasets):
+        if rtype not in ds.tables:
+            continue
+        table = np.zeros(len(ds.tables[rtype]), dtype=dtype)
+        for name in ds.tables[rtype].dtype.names:
+            table[name] = ds.tables[rtype][name]
+        table['dataset'] = k
+        tables.append(table)
+
+    if tables:
+        return np.concatenate(tables)
+    else:
+        return np.zeros(0, dtype=dtype)
@@ -0,0 +1,271 @@
+"""Decay graph of the ENSDF library: the nuclides are the nodes and the
+decays read from the DECAY datasets (parent and mode from the DSID,
+parent level and half-life from the PARENT record and branching ratio
+from the NORMALIZATION record) the edges, from parent to daughter.
+
+The graph is held as compressed sparse row (CSR) adjacency arrays:
+the edges of the node in row k are indices[indptr[k]:indptr[k + 1]],
+with their modes and branching ratios in the same positions of modes
+and branching. Nodes are nuclide ids (see nuclide_ids.py) sorted in
+increasing order, so the row of an id is found by binary search.
+"""
+import numpy as np
+
+from my_ensdf_parser import ENSDF_folder, DECAY_MODES
+from library_parser import parse_library
+from nuclide_ids import nuclide_id, nuclide_ZAm
+
+GRAPH_ARRAYS = ['nodes', 'half_lives', 'indptr', 'indices', 'modes', 'branching', 'mode_names']
+
+
+def _decay_records(ds):
+    """Extracts from a dataset what the decay graph needs, as a list of
+    tuples, either
+     - ('decay', parent Z, parent A, parent level energy, parent
+       half-life, mode, daughter Z, daughter A, branching ratio)
+       for DECAY datasets
+     - ('level', Z, A, half-life) for the ground state in ADOPTED
+       LEVELS datasets
+    """
+    if ds.type == 'ADOPTED LEVELS':
+        level = ds.first_record('LEVEL')
+        if level is not None and level.E == 0 and level.T is not None:
+            return [('level', ds.Z, ds.A, level.T)]
+        return []
+
+    if ds.type != 'DECAYS':
+        return []
+    header = ds.header
+    if header.parent_A is None:
+        return []  # e.g. muonic atoms
+
+    parent = ds.first_record('PARENT')
+    energy, half_life = 0., None
+    if parent is not None:
+        energy = parent.E or 0.
+        half_life = parent.T
+
+    branching = np.nan
+    normalization = ds.first_record('NORMALIZATION')
+    if normalization is not None and normalization.BR.strip():
+        try:
+            branching = float(normalization.BR)
+        except ValueError:
+            pass
+
+    return [('decay', header.parent_Z, header.parent_A, energy,
+             half_life, header.mode, ds.Z, ds.A, branching)]
+
+
+def _isomer_states(decays):
+    """Numbers the excited parent levels of each nuclide by increasing
+    energy (rounded to keV, symbolic energies after numeric ones),
+    returns a dict (Z, A, level key) -> isomeric state
+    """
+    levels = {}
+    for _, Z, A, energy, _, _, _, _, _ in decays:
+        if energy != 0:
+            key = (round(energy.real), energy.imag)
+            levels.setdefault((Z, A), set()).add(key)
+
+    states = {}
+    for (Z, A), keys in levels.items():
+        for m, key in enumerate(sorted(keys, key=lambda key: (key[1] != 0, key))):
+            states[(Z, A, key)] = min(m + 1, 9)
+    return states
+
+
+class decay_graph(object):
+    """Decay graph in CSR form (see the module docstring) with queries
+    of the decay chains. Single queries take and return nuclide ids,
+    batch queries return scipy.sparse matrices with a row per nuclide
+    queried and a column per node.
+    """
+    def __init__(self, nodes, half_lives, indptr, indices, modes, branching, mode_names):
+        self.nodes = np.asarray(nodes)
+        self.half_lives = np.asarray(half_lives)
+        self.indptr = np.asarray(indptr)
+        self.indices = np.asarray(indices)
+        self.modes = np.asarray(modes)
+        self.branching = np.asarray(branching)
+        self.mode_names = [str(name) for name in mode_names]
+
+        # reversed edges, to walk up the chains
+        sources = np.repeat(np.arange(len(self.nodes)), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind='mergesort')
+        self.rindices = sources[order]
+        self.rindptr = np.searchsorted(self.indices[order], np.arange(len(self.nodes) + 1))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def index(self, nids):
+        """Rows of the nuclide ids nids, -1 for those not in the graph"""
+        nids = np.asarray(nids)
+        if not len(self.nodes):
+            return np.full(nids.shape, -1)
+        rows = np.minimum(np.searchsorted(self.nodes, nids), len(self.nodes) - 1)
+        return np.where(self.nodes[rows] == nids, rows, -1)
+
+    def half_life(self, nids):
+        """Half-lives in seconds of the nuclide ids nids (inf if stable,
+        nan if unknown)
+        """
+        rows = self.index(nids)
+        half_lives = np.full(rows.shape, np.nan)
+        half_lives[rows >= 0] = self.half_lives[rows[rows >= 0]]
+        return half_lives
+
+    def daughters(self, nid):
+        """List of (daughter id, mode, branching ratio) of the decays
+        of the nuclide id nid
+        """
+        row = self.index(nid)
+        if row < 0:
+            return []
+        edges = slice(self.indptr[row], self.indptr[row + 1])
+        return [(self.nodes[k], self.mode_names[mode], br) for k, mode, br in
+                zip(self.indices[edges], self.modes[edges], self.branching[edges])]
+
+    def _reach(self, nid, indptr, indices):
+        row = self.index(nid)
+        if row < 0:
+            return self.nodes[:0]
+        visited = np.zeros(len(self.nodes), dtype=bool)
+        frontier = np.array([row])
+        while len(frontier):
+            starts, counts = indptr[frontier], np.diff(indptr)[frontier]
+            positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            frontier = np.unique(indices[positions])
+            frontier = frontier[~visited[frontier]]
+            visited[frontier] = True
+        return self.nodes[visited]
+
+    def descendants(self, nid):
+        """Ids of all the nuclides reached by the decays of nid"""
+        return self._reach(nid, self.indptr, self.indices)
+
+    def ancestors(self, nid):
+        """Ids of all the nuclides whose decays reach nid"""
+        return self._reach(nid, self.rindptr, self.rindices)
+
+    def chains(self, nid):
+        """List of the decay chains from nid to its end points (stable
+        nuclides, or those without known decays), as (ids, modes,
+        branching) where branching is the product of the branching
+        ratios along the chain
+        """
+        chains = []
+        row = self.index(nid)
+        if row < 0:
+            return chains
+        stack = [([int(row)], [], 1.)]
+        while stack:
+            rows, modes, branching = stack.pop()
+            last = rows[-1]
+            edges = range(self.indptr[last], self.indptr[last + 1])
+            if not len(edges):
+                chains.append((self.nodes[np.array(rows)].tolist(), modes, branching))
+            for k in reversed(edges):
+                daughter = self.indices[k]
+                if daughter in rows:
+                    continue  # loops only come from inconsistent data
+                stack.append((rows + [int(daughter)], modes + [self.mode_names[self.modes[k]]],
+                              branching * self.branching[k]))
+        return chains
+
+    def adjacency(self, weighted=False):
+        """The graph as a scipy.sparse CSR matrix, with the branching
+        ratios as values if weighted (nan replaced by 1), else ones
+        """
+        from scipy import sparse
+
+        values = np.where(np.isnan(self.branching), 1., self.branching) if weighted \
+            else np.ones(len(self.indices))
+        return sparse.csr_matrix((values, self.indices, self.indptr), shape=(len(self), len(self)))
+
+    def _reach_batch(self, nids, adjacency):
+        from scipy import sparse
+
+        rows = self.index(nids)
+        queries = np.nonzero(rows >= 0)[0]
+        shape = (len(rows), len(self))
+        frontier = sparse.csr_matrix((np.ones(len(queries)), (queries, rows[queries])), shape=shape)
+        reach = sparse.csr_matrix(shape)
+        while frontier.nnz:
+            frontier = frontier.dot(adjacency)
+            frontier.data[:] = 1.
+            frontier = frontier - frontier.multiply(reach)
+            frontier.eliminate_zeros()
+            reach = reach + frontier
+        return reach.astype(bool)
+
+    def descendants_batch(self, nids):
+        """Boolean matrix with the descendants (columns) of each nuclide
+        id in nids (rows), see descendants
+        """
+        return self._reach_batch(nids, self.adjacency())
+
+    def ancestors_batch(self, nids):
+        """Boolean matrix with the ancestors (columns) of each nuclide
+        id in nids (rows), see ancestors
+        """
+        return self._reach_batch(nids, self.adjacency().T.tocsr())
+
+    def save(self, path):
+        """Saves the arrays of the graph in a .npz file"""
+        np.savez_compressed(path, **dict((name, np.asarray(getattr(self, name))) for name in GRAPH_ARRAYS))
+
+
+def load_decay_graph(path):
+    """Loads a decay graph saved with decay_graph.save"""
+    with np.load(path) as arrays:
+        return decay_graph(*[arrays[name] for name in GRAPH_ARRAYS])
+
+
+def graph_from_records(records):
+    """Builds the decay graph from the records of _decay_records"""
+    decays = [record for record in records if record[0] == 'decay']
+    states = _isomer_states(decays)
+
+    half_lives = {}
+    for _, Z, A, half_life in (record for record in records if record[0] == 'level'):
+        half_lives.setdefault(nuclide_id(Z, A), half_life)
+
+    mode_names = list(DECAY_MODES)
+    edges = {}
+    for _, pZ, pA, energy, half_life, mode, Z, A, branching in decays:
+        m = states[(pZ, pA, (round(energy.real), energy.imag))] if energy != 0 else 0
+        parent, daughter = nuclide_id(pZ, pA, m), nuclide_id(Z, A)
+        if parent == daughter:
+            continue
+        if half_life is not None:
+            half_lives.setdefault(parent, half_life)
+        if mode not in mode_names:
+            mode_names.append(mode)
+        key = (parent, daughter, mode_names.index(mode))
+        if np.isnan(edges.get(key, np.nan)):
+            edges[key] = branching
+
+    nodes = np.array(sorted(set(half_lives) | set(k[0] for k in edges) | set(k[1] for k in edges)),
+                     dtype='i4')
+    keys = sorted(edges)
+    parents = np.searchsorted(nodes, [k[0] for k in keys])
+    return decay_graph(
+        nodes,
+        np.array([half_lives.get(nid, np.nan) for nid in nodes], dtype='f8'),
+        np.searchsorted(parents, np.arange(len(nodes) + 1)),
+        np.searchsorted(nodes, [k[1] for k in keys]).astype('i4'),
+        np.array([k[2] for k in keys], dtype='i1'),
+        np.array([edges[k] for k in keys], dtype='f8'),
+        mode_names,
+    )
+
+
+def build_decay_graph(folder=ENSDF_folder, files=None, processes=None):
+    """Builds the decay graph of the ENSDF library in folder, parsed with
+    a pool of processes (see parse_library for the arguments)
+    """
+    results, _ = parse_library(folder, files, func=_decay_records, processes=processes, lazy=True)
+    return graph_from_records([record for datasets in results.values()
+                               for records in datasets for record in records])
@@ -1,167 +1,257 @@
 """Checks to test the ENSDF database or the code
 correctly.
+
+The checks are plugins of a scan engine: every dataset of the library
+is parsed once (lazily) and fed to all the checks registered, which
+collect what they need and produce their part of a combined report.
 """
 
 folder = '/home/visitante/decay_tools/ENSDF/'
 import numpy as np
-import re
+from collections import OrderedDict
 
-from my_ensdf_parser import DECAY_MODES, ensdf_file
-from nuclei_data import nuclide_data
+from my_ensdf_parser import DECAY_MODES, iter_datasets
+from nuclide_ids import atomic_number, nuclide_id
 
-DSID_decay_template_str = r'(\d{1,3})(\w{1,2})(\[\+\d{1,}\]){0,1} ([\w,+,-]*) DECAY( \(.*\)){0,1}'
-DSID_decay_template_rex = re.compile(DSID_decay_template_str)
+DIAGNOSTIC_CHECKS = OrderedDict()
 
-def check_decay_types():
-    """Checks that all decays are known and recorded in the 
-    DECAY_MODES list
+def register_check(check_class):
+    """Class decorator adding a check to DIAGNOSTIC_CHECKS,
+    the checks run by default by scan_library
     """
-    mas = []
-    modes = []
-    unmatched_DSIDs = []
-    for k in range(1, 299):
-        filename = 'ensdf.{:0>3d}'.format(k)
-        ef = ensdf_file(folder + filename)
-
-        for ds in ef.datasets:
-            if ds.type == "DECAY":
-                output = DSID_decay_template_rex.match(ds.records[0].DSID)
-                if output:
-                    mode = output.group(4)
-                else:
-                    unmatched_DSIDs.append(ds.records[0].DSID)
-                if mode not in DECAY_MODES:
-                    modes.append(mode)
-            if 'MUONIC ATOM' in ds.records[0].DSID:
-                mas.append(ds.records[0].DSID)
-
-    report = ''
-    if modes:
-        report += 'The following decay modes were not present in DECAY_MODES:\n{}\n'.format('\n'.join(modes))
-    else:
-        report += 'No decay modes were found outside of DECAY_MODES.\n\n'
+    DIAGNOSTIC_CHECKS[check_class.name] = check_class
+    return check_class
 
-    if unmatched_DSIDs:
-        report += 'The following DSIDs were not captures by the regular expresion:\n{}'.format('\n'.join(unmatched_DSIDs))
+
+def _ncosid(A, elem):
+    """Nuclide id (see nuclide_ids.py), or A and element symbol
+    as a string if the symbol is not known
+    """
+    Z = atomic_number(elem)
+    if Z:
+        return nuclide_id(Z, int(A))
     else:
-        report += 'All DSIDs were captures by the regular expresion.\n'
+        return str(A) + elem
 
-    if mas:
-        report += 'Some muonic atom DSIDs:\n{}\n'.format('\n'.join(mas))
 
-    return report
-    
+class diagnostic_check(object):
+    """Base class of the checks. A check is fed every dataset with
+    visit, and once the scan is over result returns what it collected
+    and report describes it as text
+    """
+    name = ''
 
-def extract_decays():
-    """Checks that all decays are known and recorded in the 
-    DECAY_MODES list
+    def visit(self, ds, filename):
+        pass
+
+    def result(self):
+        return None
+
+    def report(self):
+        return '{}\n'.format(self.result())
+
+
+@register_check
+class decay_mode_check(diagnostic_check):
+    """Decay modes of the DECAY datasets missing in DECAY_MODES"""
+    name = 'decay modes'
+
+    def __init__(self):
+        self.modes = []
+
+    def visit(self, ds, filename):
+        if ds.header.mode is not None and not ds.header.known_mode:
+            self.modes.append(ds.header.mode)
+
+    def result(self):
+        return self.modes
+
+    def report(self):
+        if self.modes:
+            return 'The following decay modes were not present in DECAY_MODES:\n{}\n'.format('\n'.join(self.modes))
+        else:
+            return 'No decay modes were found outside of DECAY_MODES.\n\n'
+
+
+@register_check
+class unmatched_dsid_check(diagnostic_check):
+    """DSIDs of DECAY datasets not following the decay pattern of
+    FIELDS['DSID'] (see parse_dsid)
     """
-    nuc_by_decays = {}
-    for k in range(1, 29):
-        filename = 'ensdf.{:0>3d}'.format(k)
-        ef = ensdf_file(folder + filename)
-
-        for ds in ef.datasets:
-            if ds.type == "DECAY":
-                output = DSID_decay_template_rex.match(ds.records[0].DSID)
-
-                if output:
-                    A = output.group(1)
-                    elem = output.group(2)
-                    if len(elem) == 2:
-                        elem = elem[0] + elem[1:].lower()
-                    if elem in nuclide_data['symbols']:
-                        Z = nuclide_data['symbols'].index(elem)
-                        ncosid = int(A)*100+Z
-                    else:
-                        ncosid = str(A) + elem
-                                            
-                    # Eexc = output.group(3)
-                    mode = output.group(4)
-                    
-                    if ncosid in nuc_by_decays:
-                        nuc_by_decays[ncosid].append(mode)
-                    else:
-                        nuc_by_decays[ncosid] = [mode]
-
-    return nuc_by_decays
+    name = 'unmatched DSIDs'
 
+    def __init__(self):
+        self.unmatched_DSIDs = []
 
-def extract_adoptedlevels(maxA = 30):
-    """Checks that all decays are known and recorded in the 
-    DECAY_MODES list
+    def visit(self, ds, filename):
+        if ds.type == 'DECAYS' and ds.header.parent_A is None:
+            self.unmatched_DSIDs.append(ds.records[0].DSID)
+
+    def result(self):
+        return self.unmatched_DSIDs
+
+    def report(self):
+        if self.unmatched_DSIDs:
+            return 'The following DSIDs were not captures by the regular expresion:\n{}'.format('\n'.join(self.unmatched_DSIDs))
+        else:
+            return 'All DSIDs were captures by the regular expresion.\n'
+
+
+@register_check
+class muonic_atom_check(diagnostic_check):
+    """DSIDs of the muonic atom datasets"""
+    name = 'muonic atoms'
+
+    def __init__(self):
+        self.mas = []
+
+    def visit(self, ds, filename):
+        if 'MUONIC ATOM' in ds.records[0].DSID:
+            self.mas.append(ds.records[0].DSID)
+
+    def result(self):
+        return self.mas
+
+    def report(self):
+        if self.mas:
+            return 'Some muonic atom DSIDs:\n{}\n'.format('\n'.join(self.mas))
+        return ''
+
+
+@register_check
+class adopted_levels_inventory(diagnostic_check):
+    """Nuclides with an ADOPTED LEVELS dataset. If match_raw, the
+    datasets are those with "ADOPTED LEVELS" in their first record
     """
-    nuc_with_adlev = []
+    name = 'adopted levels'
+
+    def __init__(self, match_raw=False):
+        self.match_raw = match_raw
+        self.nuc_with_adlev = []
+
+    def visit(self, ds, filename):
+        if self.match_raw:
+            found = "ADOPTED LEVELS" in ds.records[0].record_raw
+        else:
+            found = ds.type == "ADOPTED LEVELS"
+        if found:
+            A = int(ds.records[0].record_raw[:3].strip())
+            elem = ds.records[0].record_raw[3:5].strip()
+            self.nuc_with_adlev.append(_ncosid(A, elem))
+
+    def result(self):
+        return self.nuc_with_adlev
+
+    def report(self):
+        return 'Nuclides with adopted levels: {}\n'.format(len(self.nuc_with_adlev))
+
+
+@register_check
+class decays_by_nuclide(diagnostic_check):
+    """Decay modes of each parent nuclide of the DECAY datasets"""
+    name = 'nuclides by decay'
+
+    def __init__(self):
+        self.nuc_by_decays = {}
+
+    def visit(self, ds, filename):
+        header = ds.header
+        if header.parent_A is not None:
+            ncosid = _ncosid(header.parent_A, header.parent_symbol)
+            # Eexc = header.isomer
+            self.nuc_by_decays.setdefault(ncosid, []).append(header.mode)
+
+    def result(self):
+        return self.nuc_by_decays
+
+    def report(self):
+        return 'Parent nuclides with decay datasets: {}\n'.format(len(self.nuc_by_decays))
+
+
+class nuclide_datasets(diagnostic_check):
+    """Nuclide ids of all datasets referring to a nuclide"""
+    name = 'nuclide datasets'
+
+    def __init__(self):
+        self.nuc_with_adlev = []
+
+    def visit(self, ds, filename):
+        if ds.Z > 0:
+            ncosid = nuclide_id(ds.Z, int(ds.A))
+            self.nuc_with_adlev.append(ncosid)
+
+
+    def result(self):
+        return self.nuc_with_adlev
+
+
+def scan_library(checks=None, maxA=299, folder=None):
+    """Scan engine: parses once every dataset of the files ensdf.001
+    up to ensdf.<maxA - 1> in folder (the module folder if None) and
+    feeds it to all the checks (instances of diagnostic_check), by
+    default one of each in DIAGNOSTIC_CHECKS. Returns the checks,
+    holding their results.
+    """
+    if folder is None:
+        folder = globals()['folder']
+    if checks is None:
+        checks = [check_class() for check_class in DIAGNOSTIC_CHECKS.values()]
+
     for k in range(1, maxA):
         filename = 'ensdf.{:0>3d}'.format(k)
-        ef = ensdf_file(folder + filename)
+        for ds in iter_datasets(folder + filename, lazy=True):
+            for check in checks:
+                check.visit(ds, filename)
 
-        for ds in ef.datasets:
-            # if "ADOPTED LEVELS" in ds.records[0].record_raw:
-            if ds.type == "ADOPTED LEVELS":
-                A = int(ds.records[0].record_raw[:3].strip())
-                elem = ds.records[0].record_raw[3:5].strip()
-                if len(elem) == 2:
-                    elem = elem[0] + elem[1:].lower()
-                if elem in nuclide_data['symbols']:
-                    Z = nuclide_data['symbols'].index(elem)
-                    ncosid = int(A)*100+Z
-                else:
-                    ncosid = str(A) + elem
-                nuc_with_adlev.append(ncosid)
+    return checks
 
-    return nuc_with_adlev
 
+def combined_report(checks):
+    """Joins the reports of the checks after a scan"""
+    return '\n'.join('--- {} ---\n{}'.format(check.name, check.report()) for check in checks)
 
-def extract_dataset_by_type(dataset_type='REFERENCES', maxA = 30):
-    """Checks that all decays are known and recorded in the 
+
+def check_decay_types():
+    """Checks that all decays are known and recorded in the
     DECAY_MODES list
     """
-    nuc_with_adlev = []
-    for k in range(1, maxA):
-        filename = 'ensdf.{:0>3d}'.format(k)
-        ef = ensdf_file(folder + filename)
+    checks = scan_library([decay_mode_check(), unmatched_dsid_check(), muonic_atom_check()])
+    return ''.join(check.report() for check in checks)
+
+
+def extract_decays():
+    """Checks that all decays are known and recorded in the
+    DECAY_MODES list
+    """
+    check, = scan_library([decays_by_nuclide()], maxA=29)
+    return check.result()
+
 
-        for ds in ef.datasets:
-            if ds.Z > 0:
-                ncosid = int(ds.A) * 100 + ds.Z
-                nuc_with_adlev.append(ncosid)
-            else:
-                pass
-                # print 'unequal types.....: ds-{} and arg-{}'.format(ds.type, dataset_type)
+def extract_adoptedlevels(maxA = 30):
+    """Checks that all decays are known and recorded in the
+    DECAY_MODES list
+    """
+    check, = scan_library([adopted_levels_inventory()], maxA=maxA)
+    return check.result()
 
-    return nuc_with_adlev
+
+def extract_dataset_by_type(dataset_type='REFERENCES', maxA = 30):
+    """Checks that all decays are known and recorded in the
+    DECAY_MODES list
+    """
+    check, = scan_library([nuclide_datasets()], maxA=maxA)
+    return check.result()
 
 
 def extract_datasets(maxA = 30):
-    """Checks that all decays are known and recorded in the 
+    """Checks that all decays are known and recorded in the
     DECAY_MODES list
     """
-    nuc_with_adlev = []
-    for k in range(1, maxA):
-        filename = 'ensdf.{:0>3d}'.format(k)
-        ef = ensdf_file(folder + filename)
-
-        for ds in ef.datasets:
-            if "ADOPTED LEVELS" in ds.records[0].record_raw:
-                A = int(ds.records[0].record_raw[:3].strip())
-                elem = ds.records[0].record_raw[3:5].strip()
-                if len(elem) == 2:
-                    elem = elem[0] + elem[1:].lower()
-                if elem in nuclide_data['symbols']:
-                    Z = nuclide_data['symbols'].index(elem)
-                    ncosid = int(A)*100+Z
-                else:
-                    ncosid = str(A) + elem
-                nuc_with_adlev.append(ncosid)
-                # if (A == 18) and (Z == 2):
-                #     print ds.records[0].record_raw[:25]
-            # else:
-            #     print ds.records[0].record_raw[:5]
-    return nuc_with_adlev
+    check, = scan_library([adopted_levels_inventory(match_raw=True)], maxA=maxA)
+    return check.result()
 
 
 if __name__ == "__main__":
 
     # print check_decay_types()
-    extract_decays()
\ No newline at end of file
+    print(combined_report(scan_library()))
@@ -0,0 +1,166 @@
+"""Index of the datasets of an ENSDF library (the files ensdf.001 to
+ensdf.298 in a folder) recording where each dataset is found and what
+it is about, so that lookups seek straight to the datasets they need
+instead of parsing whole files.
+"""
+import os
+import re
+import gzip
+import json
+
+from my_ensdf_parser import (ENSDF_folder, GZIP_SIGNATURE, dataset, get_atomic_number,
+                             iter_dataset_strings, parse_dsid)
+
+INDEX_FILENAME = 'ensdf.index.json'
+INDEX_VERSION = 2
+ENSDF_FILE_RE = re.compile(r'ensdf\.\d{3}$')
+
+# Columns of the index entries
+INDEX_COLUMNS = ['file', 'offset', 'length', 'A', 'Z', 'elem', 'type', 'DSID', 'parent_A', 'parent_Z']
+# Criteria of ensdf_index.find, looked up in dicts built with the index
+LOOKUP_KEYS = ['A', 'Z', 'elem', 'dataset_type', 'parent']
+
+
+def index_dataset(filename, offset, dataset_string):
+    """Returns the index entry of a dataset, read from its
+    identification record (the first line of dataset_string)
+    """
+    id_record = dataset_string[:80]
+    A = int(id_record[:3].strip())
+    elem = id_record[3:5].strip()
+    dsid = id_record[9:39]
+    header = parse_dsid(dsid)
+
+    return [filename, offset, len(dataset_string), A, get_atomic_number(elem),
+            elem, header.type, dsid.strip(), header.parent_A or 0, header.parent_Z or 0]
+
+
+def scan_file(path):
+    """Returns the index entries of all datasets in the ENSDF file,
+    built in one pass over the memory-mapped file. The offsets of
+    gzip compressed files are positions in the decompressed text.
+    """
+    filename = os.path.basename(path)
+    return [index_dataset(filename, offset, dataset_string)
+            for offset, dataset_string in iter_dataset_strings(path)]
+
+
+def _lookup_keys(entry):
+    """Values of the LOOKUP_KEYS of an entry (a dict)"""
+    return [entry['A'], entry['Z'], entry['elem'].lower(), entry['type'],
+            (entry['parent_A'], entry['parent_Z'])]
+
+
+class ensdf_index(object):
+    """Index of the datasets in the ENSDF files of a folder, stored in
+    the file INDEX_FILENAME of the folder. The entries of files that
+    changed (size or modification time) since the index was saved are
+    rebuilt when the index is loaded. If the index cannot be saved
+    (e.g. a read-only folder) it is only kept in memory.
+    """
+
+    def __init__(self, folder=ENSDF_folder, index_path=None):
+        self.folder = folder
+        self.index_path = index_path or os.path.join(folder, INDEX_FILENAME)
+        self.files = {}
+        self._rows = []
+        self._lookups = {}
+        self.update()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                content = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+        if content.get('version') != INDEX_VERSION:
+            return {}
+        return content['files']
+
+    def save(self):
+        """Saves the index, returns False if it could not be written"""
+        try:
+            with open(self.index_path, 'w') as f:
+                json.dump({'version': INDEX_VERSION, 'files': self.files}, f)
+        except (IOError, OSError):
+            return False
+        return True
+
+    def update(self):
+        """Loads the saved index and rescans the files added or modified
+        since it was saved. Saves the index if anything changed.
+        """
+        saved = self._load()
+        self.files = {}
+        changed = False
+        for filename in sorted(os.listdir(self.folder)):
+            if not ENSDF_FILE_RE.match(filename):
+                continue
+
+            path = os.path.join(self.folder, filename)
+            stat = os.stat(path)
+            signature = [stat.st_size, stat.st_mtime]
+            if filename in saved and saved[filename]['signature'] == signature:
+                self.files[filename] = saved[filename]
+            else:
+                self.files[filename] = {'signature': signature, 'datasets': scan_file(path)}
+                changed = True
+
+        if changed or set(saved) != set(self.files):
+            self.save()
+        self._build_lookups()
+
+    def _build_lookups(self):
+        """Builds the entries as dicts and, for each of LOOKUP_KEYS, the
+        dict from its values to the positions of the entries
+        """
+        self._rows = [dict(zip(INDEX_COLUMNS, entry)) for entry in self.entries]
+        self._lookups = dict((key, {}) for key in LOOKUP_KEYS)
+        for k, row in enumerate(self._rows):
+            for key, value in zip(LOOKUP_KEYS, _lookup_keys(row)):
+                self._lookups[key].setdefault(value, []).append(k)
+
+    @property
+    def entries(self):
+        """All the index entries, sorted by file and offset"""
+        return [entry for filename in sorted(self.files)
+                for entry in self.files[filename]['datasets']]
+
+    def find(self, A=None, Z=None, elem=None, dataset_type=None, parent=None):
+        """Returns the index entries (as dicts with INDEX_COLUMNS keys)
+        of the datasets matching all the arguments given. parent is
+        an (A, Z) tuple selecting the decay datasets of that nuclide.
+        """
+        criteria = zip(LOOKUP_KEYS, [A, Z, elem and elem.lower(), dataset_type,
+                                     parent and tuple(parent)])
+        positions = None
+        for key, value in criteria:
+            if value is None:
+                continue
+            found = set(self._lookups[key].get(value, ()))
+            positions = found if positions is None else positions & found
+        if positions is None:
+            positions = range(len(self._rows))
+        return [dict(self._rows[k]) for k in sorted(positions)]
+
+    def read(self, entry):
+        """Returns the dataset string of an index entry, read by
+        seeking to its offset in the file (in the decompressed text
+        of gzip compressed files, which is decompressed up to it)
+        """
+        with open(os.path.join(self.folder, entry['file']), 'rb') as f:
+            if f.read(len(GZIP_SIGNATURE)) == GZIP_SIGNATURE:
+                f.seek(0)
+                with gzip.GzipFile(fileobj=f) as stream:
+                    stream.seek(entry['offset'])
+                    return stream.read(entry['length']).decode('latin-1')
+            f.seek(entry['offset'])
+            return f.read(entry['length']).decode('latin-1')
+
+    def datasets(self, lazy=False, **criteria):
+        """Generator of the parsed datasets matching criteria,
+        see find for the criteria accepted
+        """
+        for entry in self.find(**criteria):
+            yield dataset(self.read(entry), (entry['file'], entry['offset']), lazy=lazy)
@@ -1,30 +1,34 @@
 """Defining the functions to convert the fields defined in 
 syntax_presets.py into their appropriate python values.
 """
+import re
+import numpy as np
 from numpy import inf
 
+h = 4.13566766e-15  # eV * s
+time_factors = {
+    'Y'   : 365*24*3600,
+    'D'   : 24*3600,
+    'H'   : 3600,
+    'M'   : 60,
+    'S'   : 1,
+    'MS'  : 1e-3,
+    'US'  : 1e-6,
+    'NS'  : 1e-9,
+    'PS'  : 1e-12,
+    'FS'  : 1e-15,
+    'AS'  : 1e-18,
+    'EV'  : h,
+    'KEV' : h / 1e3,
+    'MEV' : h / 1e6,
+}
+symbolic_re = re.compile('[A-DF-Z]')
+
 def convert_time(stable, val, units):
     """Function to convert the values read from field T
     as defined in the ENSDF manual (section V.14).
     Returns the time in seconds.
     """
-    h = 4.13566766e-15  # eV * s
-    time_factors = {
-        'Y'   : 365*24*3600,
-        'D'   : 24*3600,
-        'H'   : 3600,
-        'M'   : 60,
-        'S'   : 1,
-        'MS'  : 1e-3,
-        'US'  : 1e-6,
-        'NS'  : 1e-9,
-        'PS'  : 1e-12,
-        'FS'  : 1e-15,
-        'AS'  : 1e-18,
-        'EV'  : h,
-        'KEV' : h / 1e3,
-        'MEV' : h / 1e6,
-    }
     # print '-'.join([str(k) for k in [stable, val, units]])
     if stable == 'STABLE':
         return inf
@@ -49,11 +53,9 @@ def convert_energy(e1, e2):
     as defined in the ENSDF manual (section V.18).
     Returns the energy in keV.
     """
-    import re
-
     if e1 is None:
         val1 = 0
-    elif not re.search('[A-DF-Z]', e1):
+    elif not symbolic_re.search(e1):
         val1 = float(e1)
     else:
         val1 = complex(0, sum(ord(l) for l in e1.strip() if l not in '+-'))
@@ -62,7 +64,7 @@ def convert_energy(e1, e2):
 
     if e2 is None:
         val2 = 0
-    elif not re.search('[A-DF-Z]', e2):
+    elif not symbolic_re.search(e2):
         val2 = float(e2)
     else:
         val2 = complex(0, sum(ord(l) for l in e2.strip() if l not in '+-'))
@@ -83,6 +85,151 @@ def tofloat(val):
     else:
         return 0
 
+
+number_re = re.compile(r'\s*\(?[\+-]?\d*(?:\.(\d*))?(?:E([\+-]?\d+))?')
+asymmetric_re = re.compile(r'\s*\+(\d+)\s*-(\d+)\s*$')
+
+def convert_uncertainty(val, unc):
+    """Function to convert the uncertainty fields (DE, DRI...) into
+    absolute uncertainties. As defined in the ENSDF manual (section
+    V.14) they are given in units of the last significant digit of the
+    value val, e.g. 0.03 for E='826.10' and DE='3'. Asymmetric
+    uncertainties (+a-b) give the largest of both.
+    Returns NaN for blank fields and limits (LT, GT, AP...).
+    """
+    unc = unc.strip()
+    if unc.isdigit():
+        digits = int(unc)
+    else:
+        match = asymmetric_re.match(unc)
+        if not match:
+            return np.nan
+        digits = max(int(match.group(1)), int(match.group(2)))
+
+    decimals, exponent = number_re.match(val).groups()
+    scale = int(exponent or 0) - len(decimals or '')
+    return digits * 10.**scale if scale >= 0 else digits / 10.**-scale
+
+# Batch converters: they take a column of raw fixed-width substrings of 
+# a field (e.g. all the E fields of the LEVEL records of a file) and the
+# search method of the compiled field format (as in the extraction plans
+# of my_ensdf_parser.py), and return NumPy arrays with NaN for values
+# missing or not matching the format, together with boolean masks.
+# Plain numbers are converted in bulk, and any other substring is left
+# to the scalar converter, so that the results agree with it.
+
+def _as_bytes_array(fields):
+    fields = np.asarray(fields)
+    if fields.dtype.kind == 'U':
+        fields = np.char.encode(fields, 'latin-1')
+    elif fields.dtype.kind != 'S':
+        fields = fields.astype('S')
+    return fields
+
+def _plain_numbers(fields):
+    """Mask of the substrings holding a plain unsigned number (digits and
+    at most one decimal point, starting with a digit) and nothing else
+    but surrounding blanks, and mask of the blank substrings
+    """
+    n, width = len(fields), fields.dtype.itemsize
+    if width == 0:
+        blank = np.ones(n, dtype=bool)
+        return ~blank, blank
+
+    chars = np.ascontiguousarray(fields).view('u1').reshape(n, width)
+    space = (chars == 32) | (chars == 0)
+    digit = (chars >= 48) & (chars <= 57)
+    dot = chars == 46
+    filled = ~space
+    blank = ~filled.any(1)
+
+    first = filled.argmax(1)
+    last = width - 1 - filled[:, ::-1].argmax(1)
+    contiguous = filled.sum(1) == last - first + 1
+    starts_with_digit = digit[np.arange(n), first]
+
+    plain = ((space | digit | dot).all(1) & contiguous & starts_with_digit & 
+             (dot.sum(1) <= 1) & ~blank)
+    return plain, blank
+
+def _convert_rows(fields, rows, search, converter, values):
+    """Scalar conversion of fields[rows] into values"""
+    for k in np.flatnonzero(rows):
+        substring = fields[k].decode('latin-1')
+        match = search(substring)
+        value = converter(*match.groups()) if match else None
+        values[k] = np.nan if value is None else value
+
+def convert_energy_batch(fields, search):
+    """Batch version of convert_energy, see the comment above.
+    Returns (values, symbolic, missing), where values is a complex
+    array as convert_energy returns, symbolic flags the energies
+    given relative to a symbol (e.g. 0+X, SN+500) whose imaginary
+    part holds the symbol, and missing flags the blank fields and
+    those not matching the field format
+    """
+    fields = _as_bytes_array(fields)
+    plain, blank = _plain_numbers(fields)
+    values = np.full(len(fields), np.nan, dtype=complex)
+    values[plain] = np.char.strip(fields[plain]).astype(float)
+    _convert_rows(fields, ~plain & ~blank, search, convert_energy, values)
+
+    missing = np.isnan(values)
+    return values, (values.imag != 0) & ~missing, missing
+
+def convert_time_batch(fields, search):
+    """Batch version of convert_time, see the comment above.
+    Returns (values, stable, missing), where values are times in
+    seconds, stable flags the STABLE fields (inf) and missing the blank
+    fields and those not matching the field format or without units
+    """
+    fields = _as_bytes_array(fields)
+    values = np.full(len(fields), np.nan)
+    parts = np.char.partition(np.char.strip(fields), b' ')
+    numbers, units = parts[:, 0], np.char.strip(parts[:, 2])
+    plain, blank = _plain_numbers(numbers)
+    plain &= ~np.char.startswith(parts[:, 2], b' ')  # units right after one blank
+    blank &= (units == b'')
+
+    known = np.zeros(len(fields), dtype=bool)
+    for unit, factor in time_factors.items():
+        rows = plain & (units == unit.encode('ascii'))
+        if rows.any():
+            numbers_in_unit = numbers[rows].astype(float)
+            if 'EV' in unit:  # value is an energy width
+                values[rows] = factor / numbers_in_unit
+            else:
+                values[rows] = factor * numbers_in_unit
+            known |= rows
+    _convert_rows(fields, ~known & ~blank, search, convert_time, values)
+
+    missing = np.isnan(values)
+    return values, np.isinf(values), missing
+
+def tofloat_batch(fields, search):
+    """Batch version of tofloat, see the comment above.
+    Returns (values, missing), where missing flags the blank fields
+    and those not matching the field format
+    """
+    fields = _as_bytes_array(fields)
+    plain, blank = _plain_numbers(fields)
+    values = np.full(len(fields), np.nan)
+    values[plain] = np.char.strip(fields[plain]).astype(float)
+    _convert_rows(fields, ~plain & ~blank, search, tofloat, values)
+
+    return values, np.isnan(values)
+
+batch_converters = {
+    convert_energy : convert_energy_batch,
+    convert_time   : convert_time_batch,
+    tofloat        : tofloat_batch,
+}
+
+# Converters whose value for a plain number (digits with at most one
+# decimal point, see _plain_numbers) is that number as a float, so the
+# parser can convert such fields without searching their formats
+plain_number_converters = (convert_energy, tofloat)
+
 field_converters = {
     'E' : convert_energy,
     'T' : convert_time
@@ -0,0 +1,230 @@
+"""Index of the energies of the gamma lines of the whole ENSDF library
+(and optionally of the alpha energies and beta endpoint energies), to
+answer energy window queries such as "which gamma lines lie within
+661.6 +- 0.5 keV?" without parsing the library.
+
+The lines are held in arrays sorted by energy, with their absolute
+uncertainties (DE, see convert_uncertainty), intensities (RI for gamma
+lines, IA for alphas and IB for betas), the id of the nuclide of their
+dataset (see nuclide_ids.py) and, for DECAY datasets, the id of the
+parent and the energy of its decaying level. A window is then found by
+binary search, for many peak centroids at once. The index is saved as
+a folder with an .npy file per array, which load_line_index maps into
+memory instead of reading.
+
+    python gamma_index.py build folder index_folder
+    python gamma_index.py index_folder 661.6 [0.5]
+"""
+import os
+import sys
+import json
+import numpy as np
+from collections import OrderedDict
+
+from my_ensdf_parser import ENSDF_folder
+from field_converters import convert_uncertainty
+from library_parser import parse_library
+from hdf5_store import DATASET_TYPES
+from nuclide_ids import nuclide_id, nuclide_name
+
+# record types indexed, with the field of their intensities
+LINE_TYPES = OrderedDict([
+    ('GAMMA',          'RI'),
+    ('ALPHA',          'IA'),
+    ('BETA MINUS',     'IB'),
+    ('EC / BETA PLUS', 'IB'),
+])
+LINE_COLUMNS = [
+    ('energy',       'f8'),  # keV
+    ('uncertainty',  'f8'),  # keV, absolute, NaN if not given
+    ('intensity',    'f8'),  # NaN if not given
+    ('nuclide',      'i4'),  # id of the nuclide of the dataset
+    ('parent',       'i4'),  # id of the parent (ground state) in DECAY datasets, else 0
+    ('parent_level', 'f8'),  # keV, energy of the decaying level of the parent, else NaN
+    ('kind',         'i1'),  # index in LINE_TYPES
+    ('dataset_type', 'i1'),  # index in DATASET_TYPES
+]
+INDEX_METADATA = 'index.json'
+
+
+def _emission_lines(ds):
+    """Extracts the rows (as tuples of LINE_COLUMNS) of the records of
+    LINE_TYPES in a dataset. Symbolic energies (e.g. 100+X) are skipped.
+    """
+    parent, parent_level = 0, np.nan
+    if ds.header.parent_A is not None:
+        parent = nuclide_id(ds.header.parent_Z, ds.header.parent_A)
+        record = ds.first_record('PARENT')
+        energy = record.E if record is not None and record.E is not None else 0.
+        parent_level = energy.real if energy.imag == 0 else np.nan
+
+    nuclide = nuclide_id(ds.Z, ds.A)
+    dataset_type = DATASET_TYPES.index(ds.type)
+    rows = []
+    for record in ds.records:
+        if record.type not in LINE_TYPES:
+            continue
+        energy = record.E
+        if energy is None or energy.imag != 0:
+            continue
+        raw = record.record_raw
+        intensity = getattr(record, LINE_TYPES[record.type])
+        rows.append((energy.real, convert_uncertainty(raw[9:19], raw[19:21]),
+                     np.nan if intensity is None else intensity, nuclide, parent, parent_level,
+                     list(LINE_TYPES).index(record.type), dataset_type))
+    return rows
+
+
+def _codes(names, choices):
+    return [choices.index(name) for name in names]
+
+
+class line_index(object):
+    """Energies of the lines of the library sorted in increasing order,
+    with the rest of LINE_COLUMNS in arrays of the same order. Queries
+    return rows of these arrays.
+    """
+    def __init__(self, energy, uncertainty, intensity, nuclide, parent, parent_level, kind,
+                 dataset_type, line_types=None, dataset_types=None):
+        self.energy = energy
+        self.uncertainty = uncertainty
+        self.intensity = intensity
+        self.nuclide = nuclide
+        self.parent = parent
+        self.parent_level = parent_level
+        self.kind = kind
+        self.dataset_type = dataset_type
+        self.line_types = list(line_types or LINE_TYPES)
+        self.dataset_types = list(dataset_types or DATASET_TYPES)
+        self.max_uncertainty = np.nanmax(uncertainty) if np.isfinite(uncertainty).any() else 0.
+
+    def __len__(self):
+        return len(self.energy)
+
+    def find_batch(self, centroids, tolerances, line_types=None, dataset_types=None,
+                   with_uncertainty=False):
+        """Lines within the windows centroid +- tolerance (keV) of each
+        of the centroids, in a single vectorized search.
+
+        Arguments:
+        ---------
+        centroids: {array} the centers of the windows in keV
+        tolerances: {array or float} the half widths of the windows in keV
+        line_types: {list} keys of LINE_TYPES to keep, all if None
+        dataset_types: {list} dataset types to keep (e.g. ['DECAYS']), all if None
+        with_uncertainty: {bool} widen the window of each line by its
+                          own uncertainty
+
+        Returns (offsets, rows) in CSR style: the rows of the lines in
+        the window of centroids[k] are rows[offsets[k]:offsets[k + 1]],
+        in increasing energy.
+        """
+        centroids = np.atleast_1d(np.asarray(centroids, dtype='f8'))
+        tolerances = np.broadcast_to(np.asarray(tolerances, dtype='f8'), centroids.shape)
+        margin = self.max_uncertainty if with_uncertainty else 0.
+        starts = np.searchsorted(self.energy, centroids - tolerances - margin, 'left')
+        stops = np.searchsorted(self.energy, centroids + tolerances + margin, 'right')
+
+        counts = stops - starts
+        rows = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        queries = np.repeat(np.arange(len(centroids)), counts)
+
+        keep = np.ones(len(rows), dtype=bool)
+        if with_uncertainty:
+            uncertainty = np.nan_to_num(self.uncertainty[rows])
+            keep &= np.abs(self.energy[rows] - centroids[queries]) <= tolerances[queries] + uncertainty
+        if line_types is not None:
+            keep &= np.in1d(self.kind[rows], _codes(line_types, self.line_types))
+        if dataset_types is not None:
+            keep &= np.in1d(self.dataset_type[rows], _codes(dataset_types, self.dataset_types))
+        rows, queries = rows[keep], queries[keep]
+
+        return np.searchsorted(queries, np.arange(len(centroids) + 1)), rows
+
+    def find(self, energy, tolerance, **kwargs):
+        """Rows of the lines within energy +- tolerance (keV), see
+        find_batch for the keyword arguments
+        """
+        return self.find_batch([energy], tolerance, **kwargs)[1]
+
+    def lines(self, rows):
+        """The lines in rows as a structured array of LINE_COLUMNS"""
+        table = np.zeros(len(rows), dtype=LINE_COLUMNS)
+        for name, _ in LINE_COLUMNS:
+            table[name] = getattr(self, name)[rows]
+        return table
+
+    def describe(self, rows):
+        """The lines in rows as a list of dicts, with names instead of
+        ids and codes
+        """
+        return [{
+            'energy': line['energy'],
+            'uncertainty': line['uncertainty'],
+            'intensity': line['intensity'],
+            'nuclide': nuclide_name(line['nuclide']),
+            'parent': nuclide_name(line['parent']) if line['parent'] else None,
+            'parent_level': line['parent_level'],
+            'type': self.line_types[line['kind']],
+            'dataset_type': self.dataset_types[line['dataset_type']],
+        } for line in self.lines(rows)]
+
+    def save(self, path):
+        """Saves the index in the folder path, an .npy file per array"""
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        for name, _ in LINE_COLUMNS:
+            np.save(os.path.join(path, name + '.npy'), getattr(self, name))
+        with open(os.path.join(path, INDEX_METADATA), 'w') as f:
+            json.dump({'line_types': self.line_types, 'dataset_types': self.dataset_types}, f)
+
+
+def load_line_index(path, mmap=True):
+    """Loads an index saved with line_index.save, with its arrays mapped
+    into memory (read only) if mmap
+    """
+    with open(os.path.join(path, INDEX_METADATA)) as f:
+        metadata = json.load(f)
+    arrays = [np.load(os.path.join(path, name + '.npy'), mmap_mode='r' if mmap else None)
+              for name, _ in LINE_COLUMNS]
+    return line_index(*arrays, **metadata)
+
+
+def index_from_rows(rows, line_types=('GAMMA',), dataset_types=None):
+    """Builds the index from the rows of _emission_lines, keeping the
+    line types and dataset types given (all if None)
+    """
+    table = np.array(rows, dtype=LINE_COLUMNS)
+    if line_types is not None:
+        table = table[np.in1d(table['kind'], _codes(line_types, list(LINE_TYPES)))]
+    if dataset_types is not None:
+        table = table[np.in1d(table['dataset_type'], _codes(dataset_types, DATASET_TYPES))]
+    table = table[np.lexsort((table['nuclide'], table['energy']))]
+    return line_index(*[np.ascontiguousarray(table[name]) for name, _ in LINE_COLUMNS])
+
+
+def build_line_index(folder=ENSDF_folder, files=None, processes=None, line_types=('GAMMA',),
+                     dataset_types=None):
+    """Builds the index of the lines of the ENSDF library in folder,
+    parsed with a pool of processes (see parse_library for the
+    arguments). By default only gamma lines are indexed, pass keys of
+    LINE_TYPES in line_types for the rest (None for all).
+    """
+    results, _ = parse_library(folder, files, func=_emission_lines, processes=processes, lazy=True)
+    return index_from_rows([row for datasets in results.values() for rows in datasets for row in rows],
+                           line_types, dataset_types)
+
+
+if __name__ == "__main__":
+    if sys.argv[1] == 'build':
+        folder, path = sys.argv[2:4]
+        index = build_line_index(folder, line_types=None)
+        index.save(path)
+        print('{} lines indexed in {}'.format(len(index), path))
+    else:
+        index = load_line_index(sys.argv[1])
+        energy = float(sys.argv[2])
+        tolerance = float(sys.argv[3]) if len(sys.argv) > 3 else 1.
+        for line in index.describe(index.find(energy, tolerance)):
+            print('{energy:10.3f} {uncertainty:8.3f} {intensity:10.4g} {nuclide:>8} {type:>14} '
+                  '{dataset_type}'.format(**line))
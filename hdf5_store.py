@@ -0,0 +1,219 @@
+"""Export of the parsed ENSDF library to an HDF5 store of columnar
+tables, and loading of slices of it. The store holds:
+ - /datasets: a table with a row per dataset (see DATASET_COLUMNS),
+   with the SHA-1 hash of the text of each dataset to tell releases
+   apart (see release_diff.py)
+ - /records/<table name>: a table per record type, with a column per
+   field of RECORD_MEMBERS (converted as in columnar_ensdf.py), plus
+   the columns of RECORD_INDEX_COLUMNS and STORE_INDEX_COLUMNS
+ - /records/<table name>/index: row indices of the table sorted by
+   A, Z and dataset type, with the offsets of each value (CSR style)
+Tables are groups with a chunked, compressed HDF5 dataset per column.
+"""
+import os
+import hashlib
+import numpy as np
+
+from my_ensdf_parser import ENSDF_folder
+from syntax_presets import FIELDS
+from nuclei_data import nuclide_data
+from columnar_ensdf import columnar_dataset, record_dtype
+from ensdf_index import index_dataset, INDEX_COLUMNS
+from library_parser import parse_library
+from parse_cache import PARSER_VERSION
+
+DATASET_TYPES = sorted(FIELDS['DSID']) + ['UNKNOWN']
+DATASET_COLUMNS = [
+    ('file',     'S16'),
+    ('offset',   'i8'),
+    ('length',   'i8'),
+    ('A',        'i2'),
+    ('Z',        'i2'),
+    ('elem',     'S2'),
+    ('type',     'i1'),   # index in DATASET_TYPES
+    ('DSID',     'S30'),
+    ('parent_A', 'i2'),
+    ('parent_Z', 'i2'),
+    ('hash',     'S40'),  # SHA-1 of the dataset text
+]
+# Columns added to the record tables, from the dataset of each record
+STORE_INDEX_COLUMNS = [
+    ('dataset', 'i4'),  # row in /datasets
+    ('Z',       'i2'),
+    ('type',    'i1'),
+]
+INDEX_KEYS = {
+    'A'    : 300,
+    'Z'    : len(nuclide_data['symbols']),
+    'type' : len(DATASET_TYPES),
+}
+COMPRESSION = {'compression': 'gzip', 'compression_opts': 4, 'shuffle': True}
+CHUNK_ROWS = 4096
+
+
+def table_name(rtype):
+    """Name in the store of the table of records of type rtype"""
+    if rtype is None:
+        return 'UNCLASSIFIED'
+    return rtype.replace(' / ', '_').replace(' ', '_').replace('-', '_')
+
+
+def _append(group, columns):
+    """Appends the columns (a structured array) to the table group"""
+    for name in columns.dtype.names:
+        if name not in group:
+            group.create_dataset(name, data=columns[name], maxshape=(None,),
+                                 chunks=(CHUNK_ROWS,), **COMPRESSION)
+        else:
+            column = group[name]
+            n = column.shape[0]
+            column.resize((n + len(columns),))
+            column[n:] = columns[name]
+
+
+def _dataset_row(filename, offset, dataset_string):
+    entry = dict(zip(INDEX_COLUMNS, index_dataset(filename, offset, dataset_string)))
+    entry['type'] = DATASET_TYPES.index(entry['type'])
+    entry['hash'] = hashlib.sha1(dataset_string.encode('latin-1')).hexdigest()
+    return tuple(entry[name].encode('latin-1') if isinstance(entry[name], type(u'')) else entry[name]
+                 for name, _ in DATASET_COLUMNS)
+
+
+def _record_columns(rtype, tables):
+    """Record table of type rtype with the STORE_INDEX_COLUMNS, from a
+    list of (dataset index, dataset row, columnar table)
+    """
+    dtype = np.dtype(record_dtype(rtype).descr + STORE_INDEX_COLUMNS)
+    columns = np.zeros(sum(len(t) for _, _, t in tables), dtype=dtype)
+    n = 0
+    for index, row, table in tables:
+        part = columns[n:n + len(table)]
+        for name in table.dtype.names:
+            part[name] = table[name]
+        part['dataset'], part['Z'], part['type'] = index, row['Z'], row['type']
+        n += len(table)
+    return columns
+
+
+class store_writer(object):
+    """Writes columnar datasets to an HDF5 store, appending to its
+    tables, see export_library for the usual entry point
+    """
+    def __init__(self, h5file):
+        self.h5 = h5file
+        self.h5.attrs['parser_version'] = PARSER_VERSION
+        self.n_datasets = 0
+
+    def write(self, filename, datasets):
+        """Appends the columnar datasets of a file to the store"""
+        rows = np.array([_dataset_row(filename, ds.location[1], ds.dataset_raw) for ds in datasets],
+                        dtype=DATASET_COLUMNS)
+        if not len(rows):
+            return
+        _append(self.h5.require_group('datasets'), rows)
+
+        records = self.h5.require_group('records')
+        by_type = {}
+        for k, ds in enumerate(datasets):
+            for rtype, table in ds.tables.items():
+                by_type.setdefault(rtype, []).append((self.n_datasets + k, rows[k], table))
+
+        for rtype, tables in by_type.items():
+            group = records.require_group(table_name(rtype))
+            group.attrs['record_type'] = str(rtype)
+            _append(group, _record_columns(rtype, tables))
+
+        self.n_datasets += len(rows)
+
+    def write_indices(self):
+        """Writes the index of every record table by A, Z and type"""
+        for group in self.h5['records'].values():
+            index = group.require_group('index')
+            for key, size in INDEX_KEYS.items():
+                values = np.clip(group[key][:], 0, size - 1)
+                order = np.argsort(values, kind='mergesort').astype('i4')
+                offsets = np.searchsorted(values[order], np.arange(size + 1)).astype('i8')
+                for name, data in [(key, order), (key + '_offsets', offsets)]:
+                    if name in index:
+                        del index[name]
+                    index.create_dataset(name, data=data, **COMPRESSION)
+
+
+def export_library(h5path, folder=ENSDF_folder, files=None, processes=None):
+    """Parses the ENSDF files of a library (see library_parser.py for
+    folder, files and processes) and writes them to a new HDF5 store
+    at h5path
+    """
+    import h5py
+
+    results, _ = parse_library(folder, files, processes=processes, parser=columnar_dataset)
+    with h5py.File(h5path, 'w') as h5:
+        writer = store_writer(h5)
+        for path, datasets in results.items():
+            writer.write(os.path.basename(path), datasets)
+        if 'records' in h5:
+            writer.write_indices()
+
+
+def _select(group, key, values):
+    """Rows of the table group with the index key in values"""
+    index = group['index']
+    offsets = index[key + '_offsets'][:]
+    order = index[key]
+    values = np.atleast_1d(values)
+    rows = [order[offsets[v]:offsets[v + 1]] for v in values if 0 <= v < len(offsets) - 1]
+    return np.concatenate(rows) if rows else np.zeros(0, dtype='i4')
+
+
+def load_records(h5path, rtype, A=None, Z=None, dataset_type=None, columns=None):
+    """Loads the records of type rtype from the store, only those of
+    the datasets with mass number A, atomic number Z and type
+    dataset_type (each a value or a list of values) when given,
+    reading only the rows selected through the indices. Returns a
+    structured array with the columns requested (all if None).
+    """
+    import h5py
+
+    with h5py.File(h5path, 'r') as h5:
+        if table_name(rtype) not in h5.get('records', {}):
+            dtype = np.dtype(record_dtype(rtype).descr + STORE_INDEX_COLUMNS)
+            names = columns or dtype.names
+            return np.zeros(0, dtype=[(name, dtype[name]) for name in names])
+
+        group = h5['records'][table_name(rtype)]
+        names = columns or [name for name in group if name != 'index']
+        rows = None
+        for key, values in [('A', A), ('Z', Z), ('type', dataset_type)]:
+            if values is None:
+                continue
+            if key == 'type':
+                values = [DATASET_TYPES.index(v) for v in np.atleast_1d(values)]
+            selected = _select(group, key, values)
+            rows = selected if rows is None else np.intersect1d(rows, selected)
+
+        dtype = [(name, group[name].dtype) for name in names]
+        if rows is None:
+            table = np.zeros(group[names[0]].shape[0], dtype=dtype)
+            for name in names:
+                table[name] = group[name][:]
+        else:
+            rows = np.unique(rows)
+            table = np.zeros(len(rows), dtype=dtype)
+            if len(rows):
+                for name in names:
+                    table[name] = group[name][rows.tolist()]
+
+    return table
+
+
+def load_datasets_table(h5path):
+    """Loads the table of datasets of the store"""
+    import h5py
+
+    with h5py.File(h5path, 'r') as h5:
+        group = h5['datasets']
+        table = np.zeros(group['offset'].shape[0], dtype=DATASET_COLUMNS)
+        for name, _ in DATASET_COLUMNS:
+            if name in group:  # stores written before a column was added lack it
+                table[name] = group[name][:]
+    return table
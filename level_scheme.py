@@ -0,0 +1,211 @@
+"""Level scheme of an ENSDF dataset: arrays of its levels and gammas,
+each gamma linked to its initial level (the LEVEL record it follows)
+and to its final level, found by energy matching, and the transitions
+between levels as scipy.sparse matrices. Cascade feeding, gamma yields
+and coincidences are then matrix operations.
+
+The final level of a gamma from a level of energy Ei is the level
+closest to Ei - Eg - Eg^2 / 2Mc^2 (the nuclear recoil), accepted if it
+is within MATCH_SIGMAS combined uncertainties of the level and gamma
+energies, or within MATCH_TOLERANCE if that is larger. Energies given
+relative to a symbol (e.g. 100+X) only match levels with the same symbol.
+"""
+import numpy as np
+
+from field_converters import convert_uncertainty
+
+AMU = 931494.10242  # keV
+MATCH_SIGMAS = 3.
+MATCH_TOLERANCE = 1.  # keV
+
+
+def _number(value):
+    """value as a float, NaN if missing or not a number"""
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+def _energy(record):
+    energy = record.E
+    return complex(np.nan, 0) if energy is None else complex(energy)
+
+
+class level_scheme(object):
+    """Level scheme of a dataset (see the module docstring). Levels are
+    in file order, with the arrays
+     - energy, symbol: real and imaginary parts of E (see convert_energy)
+     - uncertainty: absolute uncertainty of E in keV
+     - J, half_life: spin and parity strings and half-lives in s
+    and gammas in file order, with the arrays
+     - energy, uncertainty: E and its absolute uncertainty in keV
+     - intensity: relative photon intensity RI
+     - transition_intensity: TI, or RI (1 + CC) where TI is not given
+     - initial, final: indices of the levels, -1 if unknown
+    prefixed by level_ and gamma_ respectively.
+    """
+    def __init__(self, ds):
+        levels, gammas = [], []
+        for record in ds.records:
+            if record.type == 'LEVEL':
+                raw = record.record_raw
+                levels.append((_energy(record), convert_uncertainty(raw[9:19], raw[19:21]),
+                               (record.J or '').strip(), _number(record.T)))
+            elif record.type == 'GAMMA':
+                raw = record.record_raw
+                intensity = _number(record.RI)
+                transition = _number(record.TI)
+                if np.isnan(transition):
+                    conversion = _number(record.CC)
+                    transition = intensity * (1 + (0. if np.isnan(conversion) else conversion))
+                gammas.append((_energy(record), convert_uncertainty(raw[9:19], raw[19:21]),
+                               intensity, transition, len(levels) - 1))
+
+        energies, uncertainties, J, half_lives = zip(*levels) if levels else [()] * 4
+        energies = np.array(energies, dtype='c16')
+        self.level_energy, self.level_symbol = energies.real, energies.imag
+        self.level_uncertainty = np.array(uncertainties, dtype='f8')
+        self.level_J = list(J)
+        self.level_half_life = np.array(half_lives, dtype='f8')
+
+        energies, uncertainties, intensities, transitions, initial = zip(*gammas) if gammas else [()] * 5
+        energies = np.array(energies, dtype='c16')
+        self.gamma_energy = energies.real
+        self.gamma_uncertainty = np.array(uncertainties, dtype='f8')
+        self.gamma_intensity = np.array(intensities, dtype='f8')
+        self.gamma_transition_intensity = np.array(transitions, dtype='f8')
+        self.gamma_initial = np.array(initial, dtype='i4')
+        self.gamma_final = self._match_final(energies, ds.A)
+
+        self.transitions = self._transition_matrix()
+        self.branching = self._branching_matrix()
+
+    @property
+    def nlevels(self):
+        return len(self.level_energy)
+
+    @property
+    def ngammas(self):
+        return len(self.gamma_energy)
+
+    def _match_final(self, energies, A):
+        """Indices of the final levels of the gammas of energies"""
+        final = np.full(len(energies), -1, dtype='i4')
+        known = self.gamma_initial >= 0
+        initial = self.gamma_initial[known]
+
+        recoil = energies.real[known]**2 / (2 * AMU * max(A, 1))
+        target = self.level_energy[initial] - energies.real[known] - recoil
+        symbol = self.level_symbol[initial] - energies.imag[known]
+        variance = (np.nan_to_num(self.gamma_uncertainty[known])**2 +
+                    np.nan_to_num(self.level_uncertainty[initial])**2)
+
+        gammas = np.nonzero(known)[0]
+        numeric = ~np.isnan(target)
+        for value in np.unique(symbol[numeric]):
+            levels = np.nonzero((self.level_symbol == value) & ~np.isnan(self.level_energy))[0]
+            rows = np.nonzero(numeric & (symbol == value))[0]
+            if not len(levels):
+                continue
+            levels = levels[np.argsort(self.level_energy[levels], kind='mergesort')]
+            position = np.searchsorted(self.level_energy[levels], target[rows])
+            below = levels[np.maximum(position - 1, 0)]
+            above = levels[np.minimum(position, len(levels) - 1)]
+            nearest = np.where(np.abs(self.level_energy[below] - target[rows]) <=
+                               np.abs(self.level_energy[above] - target[rows]), below, above)
+
+            distance = np.abs(self.level_energy[nearest] - target[rows])
+            sigma = np.sqrt(variance[rows] + np.nan_to_num(self.level_uncertainty[nearest])**2)
+            matched = ((distance <= np.maximum(MATCH_SIGMAS * sigma, MATCH_TOLERANCE)) &
+                       (nearest != initial[rows]))
+            final[gammas[rows[matched]]] = nearest[matched]
+        return final
+
+    def _transition_matrix(self):
+        """Sparse matrix of the transition intensities from the initial
+        (rows) to the final levels (columns), summed over the gammas
+        """
+        from scipy import sparse
+
+        linked = (self.gamma_final >= 0) & (self.gamma_initial >= 0)
+        intensities = np.nan_to_num(self.gamma_transition_intensity[linked])
+        return sparse.csr_matrix((intensities, (self.gamma_initial[linked], self.gamma_final[linked])),
+                                 shape=(self.nlevels, self.nlevels))
+
+    def _level_totals(self):
+        """Total transition intensity out of each level, gammas without a
+        final level included
+        """
+        known = self.gamma_initial >= 0
+        return np.bincount(self.gamma_initial[known],
+                           np.nan_to_num(self.gamma_transition_intensity[known]), self.nlevels)
+
+    def _branching_matrix(self):
+        """The transition matrix with the rows divided by the total
+        transition intensity of their level, i.e. the probability of
+        each level to decay to each other
+        """
+        from scipy import sparse
+
+        totals = self._level_totals()
+        with np.errstate(divide='ignore'):
+            scale = np.where(totals > 0, 1. / totals, 0.)
+        return sparse.diags(scale).dot(self.transitions).tocsr()
+
+    def cascade_population(self, feeding):
+        """Number of times each level is populated, directly by feeding
+        (an array over the levels, e.g. beta feedings) or through the
+        gamma cascades from the levels above
+        """
+        from scipy import sparse
+        from scipy.sparse.linalg import spsolve
+
+        identity = sparse.identity(self.nlevels, format='csc')
+        return np.atleast_1d(spsolve((identity - self.branching).T.tocsc(),
+                                     np.asarray(feeding, dtype='f8')))
+
+    def gamma_emission(self):
+        """Fraction of the decays of its initial level that emit each
+        gamma as a photon
+        """
+        totals = self._level_totals()
+        known = self.gamma_initial >= 0
+        fractions = np.zeros(self.ngammas)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fractions[known] = self.gamma_intensity[known] / totals[self.gamma_initial[known]]
+        return np.where(np.isfinite(fractions), fractions, 0.)
+
+    def gamma_yields(self, feeding):
+        """Photons of each gamma emitted per unit of the level feeding
+        (see cascade_population)
+        """
+        population = self.cascade_population(feeding)
+        yields = np.zeros(self.ngammas)
+        known = self.gamma_initial >= 0
+        yields[known] = population[self.gamma_initial[known]] * self.gamma_emission()[known]
+        return yields
+
+    def coincidences(self):
+        """Sparse matrix with the probability that the gamma of each row,
+        once emitted, is followed by the gamma of each column somewhere
+        down its cascade
+        """
+        from scipy import sparse
+        from scipy.sparse.linalg import spsolve
+
+        # reach[i, j]: times level j is populated after level i is
+        identity = sparse.identity(self.nlevels, format='csc')
+        if self.nlevels:
+            reach = sparse.csc_matrix(spsolve((identity - self.branching).tocsc(), identity))
+        else:
+            reach = identity
+
+        linked = np.nonzero(self.gamma_final >= 0)[0]
+        emitted = np.nonzero(self.gamma_initial >= 0)[0]
+        after = sparse.csr_matrix((np.ones(len(linked)), (linked, self.gamma_final[linked])),
+                                  shape=(self.ngammas, self.nlevels))
+        before = sparse.csr_matrix((self.gamma_emission()[emitted], (self.gamma_initial[emitted], emitted)),
+                                   shape=(self.nlevels, self.ngammas))
+        return after.dot(reach).dot(before).tocsr()
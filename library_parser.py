@@ -0,0 +1,145 @@
+"""Parsing of the whole ENSDF library (the files ensdf.001 to ensdf.298
+in a folder) spread over a pool of processes. Large files are split
+into chunks at dataset boundaries, so that the chains with many
+datasets do not hold back the whole parse.
+"""
+import os
+import mmap
+from collections import OrderedDict
+from multiprocessing import Pool
+from timeit import default_timer
+
+from my_ensdf_parser import END_RECORD, ENSDF_folder, iter_dataset_strings, iter_datasets
+from ensdf_index import ENSDF_FILE_RE
+
+CHUNK_SIZE = 2 ** 21  # bytes, files larger than this are split
+
+
+def library_files(folder=ENSDF_folder):
+    """Returns the paths of the ENSDF files in folder, sorted by name"""
+    return [os.path.join(folder, filename) for filename in sorted(os.listdir(folder))
+            if ENSDF_FILE_RE.match(filename)]
+
+
+def chunk_bounds(path, chunk_size=CHUNK_SIZE):
+    """Returns the list of (start, stop) byte ranges splitting the file
+    into chunks of at least chunk_size bytes, cut after END records
+    """
+    size = os.path.getsize(path)
+    if size <= chunk_size:
+        return [(0, size)]
+
+    end_record = END_RECORD.encode('ascii')
+    bounds = []
+    with open(path, 'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            start = 0
+            while start < size:
+                end = buf.find(end_record, start + chunk_size)
+                stop = size if end == -1 else end + len(end_record)
+                bounds.append((start, stop))
+                start = stop
+        finally:
+            buf.close()
+
+    return bounds
+
+
+def _parse_chunk(task):
+    """Parses the datasets of a chunk of a file in a worker process,
+    returning (path, start, results, elapsed time, profiler stats)
+    """
+    path, start, stop, func, lazy, parser, profile = task
+    if profile:
+        from parse_profile import active_profiler, parse_profiler
+        inherited = active_profiler()
+        if inherited is not None:
+            inherited.disable()  # enabled in the parent when the worker was forked
+        profiler = parse_profiler()
+        profiler.enable()
+    try:
+        t0 = default_timer()
+        if parser is None:
+            datasets = iter_datasets(path, lazy=lazy, start=start, stop=stop)
+        else:
+            datasets = (parser(dataset_string, (path, offset))
+                        for offset, dataset_string in iter_dataset_strings(path, start=start, stop=stop))
+        if func is None:
+            results = list(datasets)
+        else:
+            results = [func(ds) for ds in datasets]
+        elapsed = default_timer() - t0
+    finally:
+        if profile:
+            profiler.disable()
+    return path, start, results, elapsed, profiler.as_dict()['files'] if profile else None
+
+
+def parse_library(folder=ENSDF_folder, files=None, func=None, processes=None,
+                  lazy=False, chunk_size=CHUNK_SIZE, profiler=None, parser=None):
+    """Parses the ENSDF files of a library with a pool of processes.
+
+    Arguments:
+    ---------
+    folder: {str} the folder with the files ensdf.001 ... ensdf.298
+    files: {list} paths of the files to parse, all in folder if None
+    func: {callable} if given, it is applied to every dataset in the
+          worker processes and its return value is collected instead
+          of the dataset. It must be a module-level function (picklable)
+    processes: {int} number of worker processes, one per CPU if None
+               and 1 to parse in the current process
+    lazy: {bool} parse the datasets in lazy mode (see dataset)
+    chunk_size: {int} size in bytes from which files are split in chunks
+    profiler: {parse_profiler} if given, the parse of every chunk is
+              profiled and the stats added to it (see parse_profile.py).
+              It may be enabled already, e.g. parse_library is called
+              inside a `with profiler:` block
+    parser: {callable} if given, the datasets are built by it from
+            (dataset_string, location) instead of by iter_datasets
+            (e.g. columnar_dataset). It must be picklable, as func
+
+    Returns (results, timings), two OrderedDicts keyed by the paths of
+    the files in the order given, holding the list of datasets (or func
+    results) of each file in file order, and the parsing time of each
+    file in seconds (summed over its chunks).
+    """
+    if files is None:
+        files = library_files(folder)
+
+    bounds = OrderedDict((path, chunk_bounds(path, chunk_size)) for path in files)
+    # in the current process the chunks are profiled by profiler itself,
+    # in worker processes by their own profilers, merged into it
+    in_workers = processes != 1
+    tasks = [(path, start, stop, func, lazy, parser, profiler is not None and in_workers)
+             for path in bounds for start, stop in bounds[path]]
+    # largest chunks first, so that they do not end up last in the pool
+    tasks.sort(key=lambda task: task[2] - task[1], reverse=True)
+
+    if not in_workers:
+        if profiler is None or profiler.enabled:
+            outputs = [_parse_chunk(task) for task in tasks]
+        else:
+            with profiler:
+                outputs = [_parse_chunk(task) for task in tasks]
+    else:
+        pool = Pool(processes)
+        try:
+            outputs = list(pool.imap_unordered(_parse_chunk, tasks))
+        finally:
+            pool.close()
+            pool.join()
+
+    chunks = dict(((path, start), (results, elapsed)) for path, start, results, elapsed, _ in outputs)
+    if profiler is not None and in_workers:
+        for output in outputs:
+            profiler.merge(output[-1])
+    results, timings = OrderedDict(), OrderedDict()
+    for path in bounds:
+        results[path], timings[path] = [], 0.
+        for start, _ in bounds[path]:
+            chunk_results, elapsed = chunks[(path, start)]
+            results[path].extend(chunk_results)
+            timings[path] += elapsed
+
+    return results, timings
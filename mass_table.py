@@ -0,0 +1,284 @@
+"""Atomic masses of the nuclides read from a mass table in the format of
+the Atomic Mass Evaluation (AME, e.g. the files mass16.txt or mass.mas20
+of https://www-nds.iaea.org/amdc/), held in dense arrays indexed by
+(Z, N), and the quantities derived from them for all the nuclides at
+once: the Q-values of the decay modes of DECAY_MODES and the nucleon
+separation energies. These can be cross-checked in bulk against the
+Q-VALUE records of the ENSDF library (fields Q-, SN, SP and QA).
+
+Masses are the mass excesses of the neutral atoms in keV, NaN where the
+table has no value, so that derived quantities are NaN wherever one of
+the nuclides involved is missing. Uncertainties are combined in
+quadrature, ignoring correlations.
+
+    python mass_table.py mass16.txt [folder]
+"""
+import sys
+import numpy as np
+from collections import OrderedDict
+
+from my_ensdf_parser import ENSDF_folder, DECAY_MODES
+from syntax_presets import RECORD_MEMBERS
+from field_converters import convert_uncertainty
+from library_parser import parse_library
+from nuclide_ids import nuclide_name, nuclide_id, parse_nucid
+
+ELECTRON_MASS = 510.99895  # keV
+
+# Change from the parent to the daughter of each decay mode of
+# DECAY_MODES as (dZ, dN), the light nuclei emitted as (Z, N), one per
+# particle, and the number of positrons emitted. With atomic masses the
+# Q-value is the mass of the parent minus those of the daughter and the
+# light nuclei, minus two electron masses per positron. SF has no
+# single daughter, hence no Q-value.
+DECAY_MODE_CHANGES = {
+    'A':    (-2, -2, [(2, 2)], 0),
+    'B+':   (-1, +1, [], 1),
+    '2B+':  (-2, +2, [], 2),
+    'B+A':  (-3, -1, [(2, 2)], 1),
+    'B+P':  (-2, +1, [(1, 0)], 1),
+    'B+2P': (-3, +1, [(1, 0)] * 2, 1),
+    'B+3P': (-4, +1, [(1, 0)] * 3, 1),
+    'B-':   (+1, -1, [], 0),
+    '2B-':  (+2, -2, [], 0),
+    'B-A':  (-1, -3, [(2, 2)], 0),
+    'B-N':  (+1, -2, [(0, 1)], 0),
+    'B-2N': (+1, -3, [(0, 1)] * 2, 0),
+    'B-P':  ( 0, -1, [(1, 0)], 0),
+    'EC':   (-1, +1, [], 0),
+    '2EC':  (-2, +2, [], 0),
+    'ECP':  (-2, +1, [(1, 0)], 0),
+    'EC2P': (-3, +1, [(1, 0)] * 2, 0),
+    'ECA':  (-3, -1, [(2, 2)], 0),
+    'EC3P': (-4, +1, [(1, 0)] * 3, 0),
+    'IT':   ( 0,  0, [], 0),  # between ground states, the isomer energy is to be added
+    'N':    ( 0, -1, [(0, 1)], 0),
+    '2N':   ( 0, -2, [(0, 1)] * 2, 0),
+    'P':    (-1,  0, [(1, 0)], 0),
+    '2P':   (-2,  0, [(1, 0)] * 2, 0),
+    'SF':   None,
+    '14C':  (-6, -8, [(6, 8)], 0),
+}
+
+# Separation energies, the opposite of the Q-values of emitting the
+# nucleons from the ground state
+SEPARATION_MODES = OrderedDict([
+    ('SN',  'N'),
+    ('SP',  'P'),
+    ('S2N', '2N'),
+    ('S2P', '2P'),
+])
+
+# Fields of the Q-VALUE records compared to the mass table, with the
+# decay mode and sign of the Q-value they are equal to
+Q_RECORD_FIELDS = OrderedDict([
+    ('Q_', ('B-', 1)),
+    ('SN', ('N', -1)),
+    ('SP', ('P', -1)),
+    ('QA', ('A', 1)),
+])
+Q_RECORD_COLUMNS = [('Z', 'i2'), ('N', 'i2')] + [
+    (column, 'f8') for name in Q_RECORD_FIELDS for column in (name, 'D' + name)]
+DISAGREEMENT_COLUMNS = [
+    ('Z',                      'i2'),
+    ('N',                      'i2'),
+    ('field',                  'S2'),  # key of Q_RECORD_FIELDS
+    ('ensdf',                  'f8'),  # keV
+    ('ensdf_uncertainty',      'f8'),  # keV, NaN if not given
+    ('mass_table',             'f8'),  # keV
+    ('mass_table_uncertainty', 'f8'),  # keV
+]
+CHECK_SIGMAS = 1.
+CHECK_TOLERANCE = 1.  # keV, for rounding and values without uncertainty
+
+
+def _ame_number(string):
+    """Value of a number of an AME table, where # in place of the
+    decimal point marks values estimated from systematics
+    """
+    return float(string.replace('#', '' if '.' in string else '.'))
+
+def read_ame(path):
+    """Yields (Z, N, mass excess, uncertainty, estimated) for the
+    nuclides of an AME mass table file, skipping its header. Only the
+    leading columns N, Z, A (columns 5-19) and the first two numbers
+    after the element and origin (column 29 on) are read, which all the
+    AME formats since 2003 share.
+    """
+    with open(path) as f:
+        for line in f:
+            try:
+                N, Z, A = int(line[4:9]), int(line[9:14]), int(line[14:19])
+                excess, uncertainty = line[28:].split()[:2]
+                values = _ame_number(excess), _ame_number(uncertainty)
+            except ValueError:
+                continue
+            if N + Z == A:
+                yield (Z, N) + values + ('#' in excess,)
+
+
+def _shifted(array, dZ, dN):
+    """array[Z + dZ, N + dN] at [Z, N], NaN where out of the array"""
+    shifted = np.full(array.shape, np.nan)
+    nZ, nN = array.shape
+    Z0, Z1 = max(0, -dZ), min(nZ, nZ - dZ)
+    N0, N1 = max(0, -dN), min(nN, nN - dN)
+    if Z0 < Z1 and N0 < N1:
+        shifted[Z0:Z1, N0:N1] = array[Z0 + dZ:Z1 + dZ, N0 + dN:N1 + dN]
+    return shifted
+
+
+class mass_table(object):
+    """Mass excesses (keV) of the nuclides in arrays indexed by [Z, N]:
+     - mass_excess, uncertainty: NaN where not in the table
+     - estimated: values estimated from systematics (# in AME)
+    Derived quantities are arrays of the same shape.
+    """
+    def __init__(self, mass_excess, uncertainty, estimated):
+        self.mass_excess = mass_excess
+        self.uncertainty = uncertainty
+        self.estimated = estimated
+
+    @property
+    def shape(self):
+        return self.mass_excess.shape
+
+    def at(self, array, Z, N):
+        """Values of array (of the shape of the table) at the nuclides
+        Z, N (arrays), NaN for nuclides out of the table
+        """
+        Z, N = np.asarray(Z, dtype=int), np.asarray(N, dtype=int)
+        inside = (Z >= 0) & (Z < self.shape[0]) & (N >= 0) & (N < self.shape[1])
+        values = np.full(Z.shape, np.nan)
+        values[inside] = array[Z[inside], N[inside]]
+        return values
+
+    def q_value(self, mode):
+        """Q-values (keV) of the decay mode (a key of DECAY_MODE_CHANGES)
+        of the ground states of all the nuclides, as the parent, and
+        their uncertainties
+        """
+        changes = DECAY_MODE_CHANGES.get(mode)
+        if changes is None:
+            raise ValueError('No Q-value for the decay mode {}'.format(mode))
+        dZ, dN, particles, positrons = changes
+
+        values = self.mass_excess - _shifted(self.mass_excess, dZ, dN) - 2 * ELECTRON_MASS * positrons
+        variances = self.uncertainty**2 + _shifted(self.uncertainty, dZ, dN)**2
+        for Z, N in particles:
+            values -= self.at(self.mass_excess, Z, N)
+            variances += self.at(self.uncertainty, Z, N)**2
+        return values, np.sqrt(variances)
+
+    def q_values(self):
+        """Q-values and uncertainties of all the decay modes of
+        DECAY_MODES with a daughter, in a dict by mode
+        """
+        return OrderedDict((mode, self.q_value(mode)) for mode in DECAY_MODES
+                           if DECAY_MODE_CHANGES.get(mode) is not None)
+
+    def separation_energies(self):
+        """Separation energies (keV) of SEPARATION_MODES and their
+        uncertainties, in a dict by name
+        """
+        energies = OrderedDict()
+        for name, mode in SEPARATION_MODES.items():
+            values, uncertainties = self.q_value(mode)
+            energies[name] = -values, uncertainties
+        return energies
+
+
+def mass_table_from_rows(rows):
+    """Builds the mass table from the rows of read_ame"""
+    Z, N, excess, uncertainty, estimated = [np.array(column) for column in zip(*rows)]
+    shape = (Z.max() + 1, N.max() + 1)
+    table = mass_table(np.full(shape, np.nan), np.full(shape, np.nan), np.zeros(shape, dtype=bool))
+    table.mass_excess[Z, N] = excess
+    table.uncertainty[Z, N] = uncertainty
+    table.estimated[Z, N] = estimated
+    return table
+
+def load_mass_table(path):
+    """Loads an AME mass table file (see read_ame)"""
+    return mass_table_from_rows(list(read_ame(path)))
+
+
+def _field_slice(name):
+    i1, i2 = RECORD_MEMBERS['Q-VALUE'][name]
+    return slice(i1 - 1, i2)
+
+def _q_value_rows(ds):
+    """Extracts the Q-VALUE records of a dataset as tuples of
+    Q_RECORD_COLUMNS, with absolute uncertainties (see
+    convert_uncertainty) and NaN for the fields not given
+    """
+    rows = []
+    for record in ds.records:
+        if record.type != 'Q-VALUE':
+            continue
+        A, Z = parse_nucid(record.NUCID)
+        if not A:
+            continue
+        raw = record.record_raw
+        row = [Z, A - Z]
+        for name in Q_RECORD_FIELDS:
+            value = getattr(record, name)
+            row.append(np.nan if value is None else value)
+            row.append(convert_uncertainty(raw[_field_slice(name)], raw[_field_slice('D' + name)]))
+        rows.append(tuple(row))
+    return rows
+
+def q_value_records(folder=ENSDF_folder, files=None, processes=None):
+    """The Q-VALUE records of the ENSDF library in folder as a
+    structured array of Q_RECORD_COLUMNS, parsed with a pool of
+    processes (see parse_library for the arguments)
+    """
+    results, _ = parse_library(folder, files, func=_q_value_rows, processes=processes, lazy=True)
+    return np.array([row for datasets in results.values() for rows in datasets for row in rows],
+                    dtype=Q_RECORD_COLUMNS)
+
+
+def check_q_values(masses, records, sigmas=CHECK_SIGMAS, tolerance=CHECK_TOLERANCE):
+    """Compares the fields of Q_RECORD_FIELDS of the Q-VALUE records
+    (an array of Q_RECORD_COLUMNS) with the values derived from the
+    mass table masses. A value disagrees when it differs from the mass
+    table by more than sigmas combined uncertainties, or tolerance
+    (keV) if larger. Fields not given or nuclides missing in the table
+    are not compared.
+
+    Returns the disagreements as a structured array of
+    DISAGREEMENT_COLUMNS, by field and in the order of records.
+    """
+    checked = []
+    for name, (mode, sign) in Q_RECORD_FIELDS.items():
+        values, uncertainties = masses.q_value(mode)
+        expected = sign * masses.at(values, records['Z'], records['N'])
+        expected_uncertainty = masses.at(uncertainties, records['Z'], records['N'])
+
+        given = records[name]
+        sigma = np.sqrt(np.nan_to_num(records['D' + name])**2 + np.nan_to_num(expected_uncertainty)**2)
+        with np.errstate(invalid='ignore'):
+            bad = np.abs(given - expected) > np.maximum(sigmas * sigma, tolerance)
+        rows = np.nonzero(bad)[0]
+
+        table = np.zeros(len(rows), dtype=DISAGREEMENT_COLUMNS)
+        table['Z'], table['N'] = records['Z'][rows], records['N'][rows]
+        table['field'] = name
+        table['ensdf'], table['ensdf_uncertainty'] = given[rows], records['D' + name][rows]
+        table['mass_table'] = expected[rows]
+        table['mass_table_uncertainty'] = expected_uncertainty[rows]
+        checked.append(table)
+    return np.concatenate(checked)
+
+
+if __name__ == "__main__":
+    masses = load_mass_table(sys.argv[1])
+    folder = sys.argv[2] if len(sys.argv) > 2 else ENSDF_folder
+    records = q_value_records(folder)
+    disagreements = check_q_values(masses, records)
+    for row in disagreements:
+        print('{:>8} {:>2} {:12.3f} {:9.3f} {:12.3f} {:9.3f}'.format(
+            nuclide_name(nuclide_id(row['Z'], row['Z'] + row['N'])), row['field'].decode('ascii'),
+            row['ensdf'], row['ensdf_uncertainty'], row['mass_table'], row['mass_table_uncertainty']))
+    print('{} disagreements with {} in {} Q-VALUE records'.format(len(disagreements), sys.argv[1],
+                                                                   len(records)))
@@ -12,19 +12,29 @@
 #    - Within the file the 'datasets' can refer to the whole mass group (type 1 or 2) or... 
 #    - ... to a specific nuclide, where 'datasets' are either: comments, adopted data, or (type 4 or 5)
 
-END_RECORD = 80 * u' ' + u'\n'
+RECORD_LENGTH = 80
+END_RECORD = RECORD_LENGTH * u' ' + u'\n'
 DECAY_MODES = ['A', 'B+', '2B+', 'B+A', 'B+P', 'B+2P', 'B+3P',
                'B-', '2B-', 'B-A', 'B-N', 'B-2N', 'B-P', 
                'EC', '2EC', 'ECP', 'EC2P', 'ECA', 'EC3P', 'IT', 
                'N', '2N', 'P', '2P', 'SF', '14C']
 
 import re
+import gzip
+import mmap
+import codecs
 import numpy as np
+from collections import namedtuple
 from warnings import warn
 from syntax_presets import RECORD_MEMBERS, FIELDS, field_converters
-from nuclei_data import nuclide_data
+from field_converters import convert_time, plain_number_converters, time_factors
+from nuclide_ids import atomic_number
 
 ENSDF_datafile = '/home/visitante/decay_tools/ENSDF_2019.hdf5'
+ENSDF_folder = '/home/visitante/decay_tools/ENSDF/'
+ENSDF_ENCODING = 'latin-1'  # ENSDF is ASCII, this only guards against stray characters
+GZIP_SIGNATURE = b'\x1f\x8b'
+HDF5_SIGNATURE = b'\x89HDF\r\n\x1a\n'
 
 def tofloat(thestring):
     try:
@@ -37,12 +47,7 @@ def get_atomic_number(symbol):
     """Returns the atomic number of an atomic element
     with symbol given by the parameter symbol of type string.
     """
-    Z = 0
-    for k, s in enumerate(nuclide_data['symbols']):
-        if s.lower() == symbol.lower():
-            Z = k
-            break
-    return Z
+    return atomic_number(symbol)
 
 def dismember(string, markers, names=None):
     """Decompose string into size-limited fragments
@@ -62,74 +67,354 @@ def is_dataset(string):
     """
     return True
 
+COMMENT_FLAGS = ['c', 'd', 't', 'C', 'D', 'T']
+RECORD_KEY_SLICE = slice(5, 9)  # columns 6-9 decide the record type
+
+def _classify_record_key(key):
+    """Applies the ENSDF record type rules to the record key
+    (columns 6 to 9 of a record, see RECORD_KEY_SLICE).
+    The END record can not be told from an IDENTIFICATION record
+    by its key alone, classify_record takes care of that.
+    """
+    for rtype, rid in FIELDS['RID'].items():
+        if key[:3] == rid:
+            return rtype
+
+    if key[1:2] in COMMENT_FLAGS:
+        return 'COMMENT'
+    elif key[1:4] == 3 * u' ':
+        return 'IDENTIFICATION'
+    else:
+        # warn('Record not within expected types!\n......{}\n'.format(record_string))
+        return None
+
+# Lookup table from record key to record type. It is filled once
+# with every key built from FIELDS['RID'] and extended on demand with
+# any other key met while classifying, so each distinct key is only 
+# typed once by _classify_record_key
+RECORD_TYPES = dict(
+    (rid + char, rtype) 
+    for rtype, rid in FIELDS['RID'].items() 
+    for char in [chr(c) for c in range(32, 127)]
+)
+
 def classify_record(record_string):
     """Identifies the record type from one of the 15 different
-    types defined in ENSDF manual
-    TODO: change into form of classify_dataset based
-    on syntax_presets
+    types defined in ENSDF manual, by a lookup in RECORD_TYPES
     """
-    record_type = None
-    for key, val in FIELDS['RID'].iteritems():
-        if record_string[5:8] == val:
-            record_type = key
-
-    if record_type is None:
-        if record_string[6] in ['c', 'd', 't', 'C', 'D', 'T']:
-            record_type = 'COMMENT'
-        elif record_string == END_RECORD:
-            record_type = 'END'
-        elif record_string[6:9] == 3 * r' ':
-            record_type = 'IDENTIFICATION'
-        else:
-            # warn('Record not within expected types!\n......{}\n'.format(record_string))
-            pass
+    key = record_string[RECORD_KEY_SLICE]
+    try:
+        record_type = RECORD_TYPES[key]
+    except KeyError:
+        record_type = RECORD_TYPES[key] = _classify_record_key(key)
+
+    if record_type == 'IDENTIFICATION' and record_string == END_RECORD:
+        record_type = 'END'
 
     return record_type
 
+def classify_records(record_strings):
+    """Batch form of classify_record, returns the list of record
+    types of the records in record_strings
+    """
+    types = RECORD_TYPES
+    key_slice = RECORD_KEY_SLICE
+    record_types = []
+    append = record_types.append
+    for record_string in record_strings:
+        key = record_string[key_slice]
+        try:
+            record_type = types[key]
+        except KeyError:
+            record_type = types[key] = _classify_record_key(key)
+
+        if record_type == 'IDENTIFICATION' and record_string == END_RECORD:
+            record_type = 'END'
+        append(record_type)
+
+    return record_types
+
+# The patterns of each dataset type in FIELDS['DSID'], compiled once and
+# tried in a fixed order (sorted by type, as DATASET_TYPES of hdf5_store.py)
+DSID_PATTERNS = [(dataset_type, re.compile(r'|'.join(v) if isinstance(v, list) else v))
+                 for dataset_type, v in sorted(FIELDS['DSID'].items())]
+
 def classify_dataset(dsid_string):
     """Datasets can be classified into 5 types according to the 
        information they present (see ENSDF manual page 3). Here
-       those types are tagged as:
-       [
-           'SUMMARY_INFOS',
-           'THE_REFERENCE',
-           'ADOPTED_LINES',
-           'EVALUATED_DAT',
-           'COMBINED_VALS'
-        ]
+       those types are tagged as the keys of FIELDS['DSID'].
+       Returns the type ('UNKNOWN' if no pattern matches) and
+       the match of its pattern (None if none matches).
+    """
+    for dataset_type, pattern in DSID_PATTERNS:
+        match = pattern.match(dsid_string)
+        if match:
+            return dataset_type, match
+    return 'UNKNOWN', None
+
+
+# What the DSID tells about a dataset. The parent fields are None but for
+# DECAY datasets whose DSID follows the decay pattern of FIELDS['DSID']
+# (e.g. "60CO B- DECAY (5.2714 Y)"): the parent A, element symbol and
+# atomic number, its isomer tag (e.g. "[+2446]", None if not given), the
+# decay mode, whether it is in DECAY_MODES and the half-life in seconds
+# if given in parentheses
+dsid_header = namedtuple('dsid_header', ['type', 'parent_A', 'parent_symbol', 'parent_Z', 'isomer',
+                                         'mode', 'known_mode', 'half_life'])
+_DSID_HEADERS = {}
+
+def _dsid_half_life(value, units):
+    if not value or units not in time_factors:
+        return None
+    try:
+        return convert_time('', value, units)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def parse_dsid(dsid_string):
+    """The dsid_header of a DSID (the field of an identification record),
+    parsed once per distinct DSID
     """
-    dataset_type = 'UNKNOWN'
-    for k, v in FIELDS['DSID'].iteritems():
-        if isinstance(v, list):
-            field_re = re.compile(r'|'.join(v))
+    try:
+        return _DSID_HEADERS[dsid_string]
+    except KeyError:
+        pass
+
+    dataset_type, match = classify_dataset(dsid_string)
+    if match is not None and 'Sym' in match.re.groupindex and match.group('Sym'):
+        symbol, mode = match.group('Sym'), match.group('mode')
+        header = dsid_header(dataset_type, int(match.group('A')), symbol, atomic_number(symbol),
+                             match.group('isomer'), mode, mode in DECAY_MODES,
+                             _dsid_half_life(match.group('T'), match.group('U')))
+    else:
+        header = dsid_header(dataset_type, None, None, None, None, None, False, None)
+    _DSID_HEADERS[dsid_string] = header
+    return header
+
+
+def compile_extraction_plan(rtype):
+    """Builds the extraction plan of a record type from the record
+    syntax defined in syntax_presets.py. The plan is a tuple with an
+    entry per field: (fieldname, i1, i2, search, converter), where
+    [i1:i2] is the slice of the field in the record, search the
+    method of its compiled regular expression and converter its
+    field converter. Fields without converter keep the substring
+    and have search and converter set to None.
+    """
+    plan = []
+    for fieldname, limit_pos in RECORD_MEMBERS[rtype].items():
+        i1, i2 = limit_pos[0] - 1, limit_pos[1]
+        # if fieldname in FIELDS:  TODO: needs extending the field converters
+        if fieldname in field_converters:
+            search = re.compile(r'|'.join(FIELDS[fieldname])).search
+            converter = field_converters[fieldname]
         else:
-            field_re = re.compile(v)
+            search, converter = None, None
+        plan.append((fieldname, i1, i2, search, converter))
 
-        match = field_re.match(dsid_string)
-        if match:
-            dataset_type = k
-            break
+    return tuple(plan)
+
+EXTRACTION_PLANS = dict((rtype, compile_extraction_plan(rtype)) for rtype in RECORD_MEMBERS)
+
+# Value field of each uncertainty field, when not just 'D' + value field
+UNCERTAINTY_OF = {'DFT': 'LOGFT'}
 
-    return dataset_type, match
+def compile_validation_plan(rtype):
+    """Builds the validation plan of a record type, a tuple with an
+    entry per field that has a format in FIELDS: (fieldname, i1, i2,
+    match, value_slice), where match is the method of the compiled
+    format anchored at both ends of the field and value_slice, for
+    uncertainty fields, the slice of the field they refer to
+    """
+    members = RECORD_MEMBERS[rtype]
+    plan = []
+    for fieldname, limit_pos in sorted(members.items(), key=lambda item: item[1]):
+        if not isinstance(FIELDS.get(fieldname), list):
+            continue
+        i1, i2 = limit_pos[0] - 1, limit_pos[1]
+        match = re.compile(r'\s*(?:{})\s*\Z'.format(r'|'.join(FIELDS[fieldname]))).match
+        value_field = UNCERTAINTY_OF.get(fieldname, fieldname[1:])
+        if fieldname.startswith('D') and value_field in members:
+            v1, v2 = members[value_field]
+            value_slice = slice(v1 - 1, v2)
+        else:
+            value_slice = None
+        plan.append((fieldname, i1, i2, match, value_slice))
+
+    return tuple(plan)
+
+VALIDATION_PLANS = dict((rtype, compile_validation_plan(rtype)) for rtype in RECORD_MEMBERS)
+
+# Record type continued by a continuation record, from its columns 7-8
+CONTINUATION_TYPES = dict((rid[1:], rtype) for rtype, rid in FIELDS['RID'].items())
+CONTINUATION_TYPES[u'  '] = 'IDENTIFICATION'
 
+def validate_record(record_string, rtype):
+    """Checks the fields of a record of type rtype against their
+    formats in FIELDS. Returns the list of (fieldname, reason) of
+    the fields that do not comply, empty for a valid record.
+    """
+    problems = []
+    for fieldname, i1, i2, match, value_slice in VALIDATION_PLANS.get(rtype, ()):
+        substring = record_string[i1:i2]
+        if not substring or substring.isspace():
+            continue
+        if match(substring) is None:
+            problems.append((fieldname, 'invalid value {!r}'.format(substring.strip())))
+        elif value_slice is not None and record_string[value_slice].isspace():
+            problems.append((fieldname, 'uncertainty without a value'))
+
+    return problems
+
+def validate_lines(lines, first_line=1):
+    """Validates the records (lines without the line feed) of a dataset
+    whose first line is line number first_line in its file. Yields
+    (line number, record type, fieldname, reason, record) for every
+    problem found, with fieldname None for problems of whole records:
+    wrong length, unknown record type, and continuation records that
+    do not follow a record of their type and nuclide.
+    """
+    primary = None  # (type, NUCID) of the last record that can be continued
+    for k, line in enumerate(lines):
+        line_number = first_line + k
+        rtype = classify_record(line + u'\n')
+        if len(line) != 80:
+            yield line_number, rtype, None, 'record length {} instead of 80'.format(len(line)), line
+
+        if rtype == 'COMMENT':
+            continue
+        if line[5:6] not in (u' ', u''):
+            continued = CONTINUATION_TYPES.get(line[6:8])
+            if continued is None:
+                yield line_number, rtype, None, 'unknown record type', line
+            elif primary != (continued, line[:5]):
+                yield line_number, continued, None, 'continuation of a {} record out of sequence'.format(continued), line
+        elif rtype is None:
+            primary = None
+            yield line_number, rtype, None, 'unknown record type', line
+        else:
+            primary = (rtype, line[:5])
+            for fieldname, reason in validate_record(line, rtype):
+                yield line_number, rtype, fieldname, reason, line
+
+def validate_records(source, member=None):
+    """Validator mode of the parser: streams the records of source
+    (see iter_dataset_strings) and checks them as validate_lines does,
+    without building the datasets. Yields the problems found.
+    """
+    line_number, position = 1, 0
+    for offset, dataset_string in iter_dataset_strings(source, member):
+        # only END records lie between datasets
+        line_number += (offset - position) // len(END_RECORD)
+        lines = dataset_string.split(u'\n')
+        if lines[-1] == u'':
+            lines.pop()
+        for problem in validate_lines(lines, line_number):
+            yield problem
+        line_number += len(lines)
+        position = offset + len(dataset_string)
+
+
+def get_decay_data(A, Z, index=None):
+    """Returns the decay datasets of the nuclide with mass number A
+    and atomic number Z, parsed from the ENSDF files after looking them
+    up in the index of the library (see ensdf_index.py).
+    """
+    if index is None:
+        from ensdf_index import ensdf_index
+        index = ensdf_index(ENSDF_folder)
+
+    # the decay datasets are found in the files of the daughters, 
+    # i.e. with A<= than the one of the nuclide
+    return list(index.datasets(dataset_type='DECAYS', parent=(A, Z)))
+
+_decode_bytes = codecs.getdecoder(ENSDF_ENCODING)
+RAW_END_LINE = END_RECORD[:-1].encode('ascii')
+# record types by the raw bytes of the record key, see RECORD_TYPES
+RAW_RECORD_TYPES = {}
+
+class raw_text(object):
+    """The text of a dataset, held as the slice [start:end] of a bytes-like
+    buffer shared by all the datasets of a file (the file's bytes or its
+    mmap) instead of a string of its own. Offsets given to its methods are
+    relative to start. Text is decoded on demand from memoryview slices of
+    the buffer, where the buffer supports them (not a Python 2 mmap).
+    A pickled raw_text holds a copy of its slice only.
+    """
+    __slots__ = ('data', 'view', 'start', 'end')
+
+    def __init__(self, data, start=0, end=None):
+        self.data = data
+        try:
+            self.view = memoryview(data)
+        except TypeError:
+            self.view = None
+        self.start = start
+        self.end = len(data) if end is None else end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def decode(self, i=0, j=None):
+        """The text of [i:j] as a string"""
+        j = len(self) if j is None else j
+        if self.view is not None:
+            return _decode_bytes(self.view[self.start + i:self.start + j])[0]
+        return _decode(self.data[self.start + i:self.start + j])
+
+    def line_spans(self):
+        """(start, stop) of the lines of the text, without their line
+        feeds, as in text.split('\\n')
+        """
+        data, base, end = self.data, self.start, self.end
+        find = data.find
+        spans = []
+        append = spans.append
+        pos = base
+        while True:
+            stop = find(b'\n', pos, end)
+            if stop == -1:
+                append((pos - base, end - base))
+                return spans
+            append((pos - base, stop - base))
+            pos = stop + 1
+
+    def record_type(self, i, j):
+        """classify_record of the line [i:j], looking up its key bytes
+        instead of decoding the line
+        """
+        if i == j:
+            return 'END'  # blank line, taken as an END record
+        if j - i < RECORD_KEY_SLICE.stop:
+            return classify_record(self.decode(i, j) + u'\n')
+
+        data, base = self.data, self.start
+        key = data[base + i + RECORD_KEY_SLICE.start:base + i + RECORD_KEY_SLICE.stop]
+        try:
+            record_type = RAW_RECORD_TYPES[key]
+        except KeyError:
+            record_type = RAW_RECORD_TYPES[key] = classify_record(RECORD_KEY_SLICE.start * u' ' + _decode(key))
+        if (record_type == 'IDENTIFICATION' and j - i == len(RAW_END_LINE) and
+                data[base + i:base + j] == RAW_END_LINE):
+            record_type = 'END'
+        return record_type
 
-# def get_decay_data(A, Z):
-#     """Parse the relevant ENSDF file from the database and 
-#     return an object with the relevant decay data.
-#     """
+    def flag(self, i, j):
+        """Column 6 of the line [i:j] followed by its line feed, the
+        character telling continuation records
+        """
+        if i == j:
+            return b' '  # blank line
+        if j - i == 5:
+            return b'\n'
+        return self.data[self.start + i + 5:self.start + i + 6]
 
-#     # parse ENSDF with the correct A and extract datasets of 
-#     # the nuclide requested....
-#     filename = 'ensdf.{:0>3d}'.format(A)
-#     with h5py.File(ENSDF_datafile, 'r') as ensdf:
-#         ensdf_obj = ensdf_file(ensdf[filename])
+    def __getstate__(self):
+        return (self.data[self.start:self.end],)
 
-#     for ds in ensdf_obj.datasets:
-#         if (ds.A == A) and (ds.Z == Z):
-#             pass
+    def __setstate__(self, state):
+        self.__init__(state[0])
 
-#     # parse ENSDF files with A<= to get its decay levels if 
-#     # the nuclide has decays
 
 class record_group(object):
     """A class to represent a group of records which
@@ -138,14 +423,32 @@ class record_group(object):
     TODO: make compatible with two records of different types
     like LEVEL+B- records which always come toghether
     """
-    def __init__(self, record_string, recordstype=None):
+    def __init__(self, record_string, recordstype=None, lazy=False, raw=None, span=None):
         """Receives the record in string format (80 character string)
-        and determines its type and info based on its content
+        and determines its type and info based on its content.
+        If lazy, the fields are only extracted on first access to any
+        of them (see __getattr__)
+
+        Instead of record_string, the record can be given as the span
+        (start, first line stop, stop) of its lines in the raw_text raw
+        of its dataset, which then holds its text (see record_raw)
         """
-        self.record_raw = record_string
+        # _raw holds either record_string or (raw, span...), in a single
+        # attribute since records get one per field besides
+        if raw is None:
+            self._raw = record_string
+            head = record_string[:5]
+        else:
+            start, line_stop, stop = span
+            self._raw = (raw, start, line_stop, stop)
+            if line_stop - start >= 5:
+                pos = raw.start + start
+                head = _decode(raw.data[pos:pos + 5])
+            else:
+                head = raw.decode(start, line_stop) if line_stop > start else END_RECORD[:5]
         self.type = recordstype
-        self.A = record_string[:3].strip()
-        self.elem = record_string[3:5]
+        self.A = head[:3].strip()
+        self.elem = head[3:5]
 
         # might be a continuation record, check char in pos 5
         # which should be any of (1..9, a..z)
@@ -153,41 +456,84 @@ class record_group(object):
         if self.type != 'END':
             self.A = int(self.A)
         
-        self._populate_data()
+        if not lazy:
+            self._populate_data()
+
+    @property
+    def record_raw(self):
+        """The text of the record group: its lines with their line feeds,
+        the first line followed by a blank line except in the first group
+        of a dataset (as the groups were always built)
+        """
+        if not isinstance(self._raw, tuple):
+            return self._raw
+        raw, start, line_stop, stop = self._raw
+        line = raw.decode(start, line_stop) if line_stop > start else END_RECORD[:-1]
+        continuation = raw.decode(line_stop + 1, stop) + u'\n' if stop > line_stop else u''
+        return line + (u'\n' if start == 0 else u'\n\n') + continuation
 
     def _populate_data(self):
         """Extracts info from record based on the record
-        syntax defined in syntax_presets.py
+        syntax defined in syntax_presets.py, following the
+        extraction plan of its record type. The formats of the
+        converted fields are only searched when they do not hold
+        plain numbers
         """
         if self.type:
-            rtype = self.type
-            for fieldname, limit_pos in RECORD_MEMBERS[rtype].iteritems():
-                i1, i2 = limit_pos[0] - 1, limit_pos[1]
-                substring = self.record_raw[i1:i2]
-                # if fieldname in FIELDS:  TODO: needs extending the field converters
-                if fieldname in field_converters:
-                    regex = r'|'.join(FIELDS[fieldname])
-                    match = re.search(regex, substring)
-                    if match:
-                        value = field_converters[fieldname](*match.groups())
-                    else:
-                        value = None
-                    self.__setattr__(fieldname, value)
+            attributes = self.__dict__
+            # fields are sliced from the first line, unless it is shorter
+            # than a record and they would run into the following lines
+            text = self._raw
+            if isinstance(text, tuple) and text[2] - text[1] >= RECORD_LENGTH:
+                record_raw = text[0].decode(text[1], text[2])
+            else:
+                record_raw = self.record_raw
+            for fieldname, i1, i2, search, converter in EXTRACTION_PLANS[self.type]:
+                substring = record_raw[i1:i2]
+                if converter is None:
+                    attributes[fieldname] = substring
+                    continue
+                elif substring.isspace():
+                    # blank fields never match the field formats
+                    attributes[fieldname] = None
+                    continue
+                elif converter in plain_number_converters:
+                    # plain numbers, the bulk of the values, are taken as
+                    # they are (float fails on digits of other scripts)
+                    number = substring.strip()
+                    if number[:1].isdigit() and number.replace(u'.', u'', 1).isdigit():
+                        try:
+                            attributes[fieldname] = float(number)
+                            continue
+                        except ValueError:
+                            pass
+                match = search(substring)
+                if match:
+                    attributes[fieldname] = converter(*match.groups())
                 else:
-                    self.__setattr__(fieldname, substring)
+                    attributes[fieldname] = None
+
+    def __getattr__(self, name):
+        """Only called for attributes not found, which for lazy record
+        groups are the fields before the first extraction
+        """
+        rtype = self.__dict__.get('type')
+        if name in RECORD_MEMBERS.get(rtype, ()):
+            self._populate_data()
+            return self.__dict__[name]
+        raise AttributeError(name)
 
     def __iter__(self):
         rtype = self.type
-        for attr, value in self.__dict__.iteritems():
-            if attr in RECORD_MEMBERS[rtype]:
-                yield attr, value
+        for attr in RECORD_MEMBERS[rtype]:
+            yield attr, getattr(self, attr)
 
 
 class dataset(object):
     """A class that represents the datasets contained in ENSDF
     """
 
-    def __init__(self, dataset_string, loc):
+    def __init__(self, dataset_string, loc, lazy=False, raw=None):
         """Receives the string representing the dataset, which
         should be composed of 2 or more lines (referred to as 
         `records` in the ENSDF manual. Populates the class members
@@ -207,69 +553,244 @@ class dataset(object):
         Arguments:
         ---------
         dataset_string: {str} the dataset, a collection of 80char lines
+        lazy: {bool} if True, the records are only split and classified, 
+              and their fields extracted on first access
+        raw: {raw_text} the dataset as a slice of the buffer of its file,
+             given instead of dataset_string (None) so that the text of
+             the file is not copied
         """
-        if not is_dataset(dataset_string):
-            warn('The argument dataset_string does not have a `dataset` structure!')
+        if raw is None:
+            if not is_dataset(dataset_string):
+                warn('The argument dataset_string does not have a `dataset` structure!')
+            raw = raw_text(dataset_string.encode(ENSDF_ENCODING))
 
         self.location = loc
-        self.dataset_raw = dataset_string
+        self.raw = raw
         self.records = []
         self.type = ''  # the type of dataset (1 of 5)
 
-        # parse string and build list of records, group records 
-        rs_lines_list = self.dataset_raw.split(u'\n')
+        # split the text into lines and group records, as spans of
+        # (start, first line stop, stop) in the text
+        lines = raw.line_spans()
+        data, base = raw.data, raw.start
+        key_start, key_stop = RECORD_KEY_SLICE.start, RECORD_KEY_SLICE.stop
+        record_types = RAW_RECORD_TYPES
 
         prev_type = 'IDENTIFICATION'  # all datasets start with this record type
-        prev_record = rs_lines_list[0]
-        record_string = prev_record + u'\n'
-        for rec in rs_lines_list[1:]:
-            if rec == '':
-                # Residual from split, eliminate in future
-                rec = 80 * u' '
-
-            new_record = rec + u'\n'
-            new_type = classify_record(new_record)
-            
-            if (new_type == prev_type) and (new_record[5] > prev_record[5]):
+        start, line_stop = lines[0]
+        stop = line_stop
+        prev_flag = raw.flag(start, line_stop)
+        for i, j in lines[1:]:
+            key = data[base + i + key_start:base + i + key_stop]
+            if j - i >= RECORD_LENGTH and key in record_types:
+                # the usual full length record of a known key
+                new_type = record_types[key]
+                if new_type == 'IDENTIFICATION':
+                    new_type = raw.record_type(i, j)
+                new_flag = key[:1]
+            else:
+                new_type = raw.record_type(i, j)
+                new_flag = raw.flag(i, j)
+
+            if (new_type == prev_type) and (new_flag > prev_flag):
                 # For records that support continuation which are some comments and 
                 # the records [IDENTIFICATION, HISTORY, PARENT, NORMALIZATION].
                 # If it is a continuation record, char in pos 5
                 # should be any of (1..9, a..z)
                 # TODO: a group can be interjected by a comment, and this is not taken into account atm.... fix it
-                record_string += new_record
+                stop = j
             else:
-                self.records.append(record_group(record_string, recordstype=prev_type))
+                self.records.append(record_group(None, recordstype=prev_type, lazy=lazy,
+                                                 raw=raw, span=(start, line_stop, stop)))
                 prev_type = new_type
-                prev_record = new_record
-                record_string = prev_record + u'\n'             
-        
-        self.A = int(self.records[0].record_raw[:3].strip())
-        self.elem = self.records[0].record_raw[3:5].strip()
+                prev_flag = new_flag
+                start, line_stop, stop = i, j, j
+
+        self.A = int(self.records[0].A)
+        self.elem = self.records[0].elem.strip()
         self.Z = get_atomic_number(self.elem)
         
-        self.type, _ = classify_dataset(self.records[0].DSID)
+        self.header = parse_dsid(self.records[0].DSID)
+        self.type = self.header.type
+
+    @property
+    def dataset_raw(self):
+        """The text of the dataset, decoded from its raw_text"""
+        return self.raw.decode()
+
+    def first_record(self, rtype):
+        """The first record of type rtype of the dataset, None if none"""
+        for record in self.records:
+            if record.type == rtype:
+                return record
+        return None
+
+    @property
+    def level_scheme(self):
+        """The level scheme of the dataset (see level_scheme.py), built
+        on first access
+        """
+        if '_level_scheme' not in self.__dict__:
+            from level_scheme import level_scheme
+            self._level_scheme = level_scheme(self)
+        return self._level_scheme
+
+
+def _decode(text):
+    if isinstance(text, bytes):
+        return text.decode(ENSDF_ENCODING)
+    return text
+
+def _dataset_spans(buf, start=0, stop=None):
+    """Yields (offset, end) of the datasets in buf[start:stop], where buf
+    is a string or a bytes-like buffer (e.g. mmap), i.e. the slices
+    buf.split(END_RECORD) would return, without copying them
+    """
+    end_record = END_RECORD if isinstance(buf, type(END_RECORD)) else END_RECORD.encode('ascii')
+    stop = len(buf) if stop is None else min(stop, len(buf))
+    pos = start
+    while True:
+        end = buf.find(end_record, pos, stop)
+        if end == -1:
+            if pos < stop:
+                yield pos, stop
+            break
+        if end > pos:
+            yield pos, end
+        pos = end + len(end_record)
+
+def _split_buffer(buf, start=0, stop=None):
+    """Yields (offset, dataset_string) for the datasets in buf[start:stop],
+    where buf is a string or a bytes-like buffer (e.g. mmap), as done by
+    buf.split(END_RECORD) but without building the list of datasets
+    """
+    for pos, end in _dataset_spans(buf, start, stop):
+        yield pos, _decode(buf[pos:end])
+
+def _split_stream(stream):
+    """Yields (offset, dataset_string) for the datasets read line by line
+    from the file object stream, so only one dataset is held in memory
+    """
+    pos = offset = 0
+    lines = []
+    for line in stream:
+        line = _decode(line)
+        if line == END_RECORD:
+            if lines:
+                yield offset, u''.join(lines)
+            lines = []
+            pos += len(line)
+            offset = pos
+        else:
+            lines.append(line)
+            pos += len(line)
+    if lines:
+        yield offset, u''.join(lines)
+
+def iter_dataset_strings(source, member=None, start=0, stop=None):
+    """Generator of (offset, dataset_string) for every dataset in source,
+    where offset is the position of the dataset in the file. The source 
+    can be:
+     - the path to a plain ENSDF file, which is memory-mapped and can
+       be restricted to the bytes [start:stop], which should be 
+       dataset boundaries
+     - the path to a gzip compressed ENSDF file, which is streamed
+     - the path to an HDF5 file, where member names the ENSDF file in it
+     - an HDF5 dataset holding an ENSDF file (as ENSDF_datafile members)
+     - a file object, which is streamed
+    """
+    if hasattr(source, 'read'):
+        for item in _split_stream(source):
+            yield item
+    elif not isinstance(source, (str, type(u''))):
+        # HDF5 dataset
+        value = source[()] if hasattr(source, '__getitem__') else source.value
+        for item in _split_buffer(_decode(value)):
+            yield item
+    else:
+        with open(source, 'rb') as f:
+            signature = f.read(len(HDF5_SIGNATURE))
+            f.seek(0)
+            if signature.startswith(GZIP_SIGNATURE):
+                with gzip.GzipFile(fileobj=f) as stream:
+                    for item in _split_stream(stream):
+                        yield item
+            elif signature == HDF5_SIGNATURE:
+                import h5py
+                with h5py.File(source, 'r') as ensdf:
+                    for item in iter_dataset_strings(ensdf[member]):
+                        yield item
+            elif signature:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    for item in _split_buffer(buf, start, stop):
+                        yield item
+                finally:
+                    buf.close()
+
+def _file_buffer(source, member=None):
+    """The whole text of source (see iter_dataset_strings) as one
+    bytes-like buffer: the mmap of a plain ENSDF file, left open for the
+    datasets sliced from it, or the value of an HDF5 member. None for
+    streamed sources (file objects and gzip files).
+    """
+    if hasattr(source, 'read'):
+        return None
+    elif not isinstance(source, (str, type(u''))):
+        # HDF5 dataset
+        value = source[()] if hasattr(source, '__getitem__') else source.value
+        return value if isinstance(value, bytes) else value.encode(ENSDF_ENCODING)
+
+    with open(source, 'rb') as f:
+        signature = f.read(len(HDF5_SIGNATURE))
+        f.seek(0)
+        if signature.startswith(GZIP_SIGNATURE):
+            return None
+        elif signature == HDF5_SIGNATURE:
+            import h5py
+            with h5py.File(source, 'r') as ensdf:
+                return _file_buffer(ensdf[member])
+        elif not signature:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def iter_datasets(source, lazy=False, member=None, start=0, stop=None):
+    """Generator of the datasets in source, parsed one at a time. The
+    location of each dataset is set to (name, offset), see
+    iter_dataset_strings for the supported sources and the meaning of
+    offset, start and stop. The datasets of a file (except streamed ones,
+    parsed in constant memory) share one buffer with its text, the mmap
+    of plain files, and only hold their offsets into it (see raw_text).
+    """
+    name = getattr(source, 'name', member or source)
+    buf = _file_buffer(source, member)
+    if buf is None:
+        for offset, dataset_string in iter_dataset_strings(source, member, start, stop):
+            yield dataset(dataset_string, (name, offset), lazy=lazy)
+    else:
+        for offset, end in _dataset_spans(buf, start, stop):
+            yield dataset(None, (name, offset), lazy=lazy, raw=raw_text(buf, offset, end))
 
 
 class ensdf_file(object):
     """A class to represent and contain the information of
     a file in the format of ENSDF. 
     """
-    def __init__(self, ensdf):
+    def __init__(self, ensdf, lazy=False, member=None, cache=False):
+            """Receives the ENSDF file as any source accepted by
+            iter_dataset_strings and parses all its datasets. If cache,
+            the path of a file (plain ENSDF, gzip or HDF5 with member) is
+            expected and the parsed datasets are loaded from the parse
+            cache (see parse_cache.py)
+            """
             # code_name = 'utf-8'  # closest to ASCII-7 used in ENSDF, python3
 
-            self.filename = ensdf.name
-
-            self.datasets = []
-            split_datasets = ensdf.value.split(END_RECORD)
-            for dataset_string in split_datasets:
-                if dataset_string == u'':
-                    # EOF reached
-                    continue
-                
-                # ds = dataset(dataset_string + END_RECORD, None)
-                ds = dataset(dataset_string, None)
-                
-                self.datasets.append(ds)
+            self.filename = getattr(ensdf, 'name', member or ensdf)
+            if cache:
+                from parse_cache import load_datasets
+                self.datasets = load_datasets(ensdf, member=member, lazy=lazy)
+            else:
+                self.datasets = list(iter_datasets(ensdf, lazy=lazy, member=member))
 
 
 if __name__ == "__main__":    
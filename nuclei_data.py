@@ -36,4 +36,4 @@ nuclide_data = {
                  '(Ununseptium)', '(Ununoctium)']
 }
 
-# load masses from mass table numas2016
\ No newline at end of file
+# masses: see mass_table.py, which loads them from an AME mass table (e.g. mass16.txt)
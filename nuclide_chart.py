@@ -0,0 +1,279 @@
+"""Chart of the nuclides: what the ENSDF library tells about the ground
+state of each nuclide, in dense arrays indexed by [Z, N], so that whole
+chart queries are single array expressions, e.g. the beta-delayed
+neutron emitters with half-lives below 1 s:
+
+    chart = load_nuclide_chart('chart')
+    chart.nuclides(chart.has_modes('B-N') & (chart.half_life < 1))
+
+The arrays are read from the ADOPTED LEVELS datasets (half-life, spin
+and parity of the ground state, and the decay modes of its branchings,
+e.g. "%B-=100$%B-N=2.60 4" in the continuation records of its LEVEL
+record) and the DECAY datasets of ground state parents (decay modes,
+and half-life from the PARENT record where the adopted levels give
+none), as in decay_graph.py:
+ - half_life: seconds, inf for stable nuclides, NaN if not known
+ - modes: bitmask of the decay modes, bit k for mode_names[k] (the
+   DECAY_MODES when built) and bit len(mode_names) for any other mode
+   (named OTHER_MODE in queries)
+ - jpi: spin and parity codes (see encode_jpi)
+ - has_data: nuclides with an ADOPTED LEVELS dataset or the ground state
+   parent of a DECAY dataset
+The chart is saved as a folder with an .npy file per array, which
+load_nuclide_chart maps into memory instead of reading.
+
+    python nuclide_chart.py build folder chart_folder
+    python nuclide_chart.py chart_folder
+"""
+import os
+import re
+import sys
+import json
+import numpy as np
+
+from my_ensdf_parser import ENSDF_folder, DECAY_MODES
+from library_parser import parse_library
+from decay_graph import _decay_records
+from nuclide_ids import nuclide_id
+
+CHART_ARRAYS = [
+    ('half_life', 'f8'),
+    ('modes',     'u4'),
+    ('jpi',       'u2'),
+    ('has_data',  'b1'),
+]
+CHART_METADATA = 'chart.json'
+OTHER_MODE_BIT = len(DECAY_MODES)
+OTHER_MODE = 'other'
+
+# J/pi codes: 2J in the low byte (JPI_UNKNOWN_SPIN if not given), then
+# the parity and whether the assignment is tentative (in parentheses)
+JPI_UNKNOWN_SPIN = 0xFF
+JPI_PARITY_SHIFT = 8  # 0: not given, 1: +, 2: -
+JPI_TENTATIVE = 1 << 10
+JPI_UNKNOWN = JPI_UNKNOWN_SPIN
+PARITIES = ['', '+', '-']
+jpi_re = re.compile(r'(\d+)(/2)?\s*([\+-])?')
+# A branching of a continuation record, e.g. %B-N=2.60 4, %A<0.1, %SF AP 2
+# or %EC+%B+=100 (one value for EC and B+ together)
+branching_re = re.compile(r'\s*%(\S+?)\s*(?:[=<>\?]|(?:AP|LT|GT|LE|GE|SY)\b)')
+
+
+def encode_jpi(J):
+    """Code of a J field (e.g. '5/2+', '(3-)', '1/2(+)', '(1,2)+'),
+    from its first spin value and the parity given with it or after
+    the list of values
+    """
+    J = J.strip()
+    match = jpi_re.search(J.replace('(', '').replace(')', ''))
+    if match is None:
+        return JPI_UNKNOWN
+    spin = int(match.group(1)) * (1 if match.group(2) else 2)
+    parity = match.group(3) or (J[-1] if J[-1:] in ('+', '-') else '')
+    code = min(spin, JPI_UNKNOWN_SPIN - 1) | PARITIES.index(parity) << JPI_PARITY_SHIFT
+    return code | JPI_TENTATIVE if '(' in J else code
+
+def decode_jpi(code):
+    """J string of a code of encode_jpi, e.g. '5/2+' or '(3-)', empty
+    if unknown
+    """
+    spin = code & JPI_UNKNOWN_SPIN
+    if spin == JPI_UNKNOWN_SPIN:
+        return ''
+    J = '{}/2'.format(spin) if spin % 2 else str(spin // 2)
+    J += PARITIES[code >> JPI_PARITY_SHIFT & 3]
+    return '({})'.format(J) if code & JPI_TENTATIVE else J
+
+
+def mode_bit(mode):
+    """Bit of a decay mode in the modes bitmask"""
+    return 1 << (DECAY_MODES.index(mode) if mode in DECAY_MODES else OTHER_MODE_BIT)
+
+
+def branching_modes(records):
+    """Decay modes of the branchings (see branching_re) given in the
+    continuation records of a LEVEL record, read from the records
+    following it up to the next record of a known type but comments
+    """
+    modes = []
+    for record in records:
+        if record.type == 'COMMENT':
+            continue
+        elif record.type is not None:
+            break
+        for line in record.record_raw.split(u'\n'):
+            if line[5:6].strip() and line[6:8] == u' L':
+                for entry in line[9:].split(u'$'):
+                    match = branching_re.match(entry)
+                    if match:
+                        modes.extend(match.group(1).split(u'+%'))
+    return modes
+
+
+def _chart_records(ds):
+    """Extracts from a dataset what the chart needs: the records of
+    _decay_records of decay_graph.py, and ('adopted', Z, A, J, modes)
+    for the ground state of ADOPTED LEVELS datasets (J empty if not
+    given, modes those of its branchings)
+    """
+    records = _decay_records(ds)
+    if ds.type == 'ADOPTED LEVELS':
+        J, modes = '', []
+        for k, level in enumerate(ds.records):
+            if level.type == 'LEVEL':
+                if level.E == 0:
+                    J = level.J or ''
+                    modes = branching_modes(ds.records[k + 1:])
+                break
+        records.append(('adopted', ds.Z, ds.A, J, modes))
+    return records
+
+
+class nuclide_chart(object):
+    """The arrays of CHART_ARRAYS indexed by [Z, N] (see the module
+    docstring), with the names of the bits of modes
+    """
+    def __init__(self, half_life, modes, jpi, has_data, mode_names=None):
+        self.half_life = half_life
+        self.modes = modes
+        self.jpi = jpi
+        self.has_data = has_data
+        self.mode_names = list(mode_names or DECAY_MODES)
+
+    @property
+    def shape(self):
+        return self.half_life.shape
+
+    @property
+    def other_mode_bit(self):
+        """Bit of the modes outside mode_names"""
+        return len(self.mode_names)
+
+    @property
+    def two_J(self):
+        """Twice the ground state spins, -1 if not known"""
+        spins = (self.jpi & JPI_UNKNOWN_SPIN).astype('i2')
+        spins[spins == JPI_UNKNOWN_SPIN] = -1
+        return spins
+
+    @property
+    def parity(self):
+        """Ground state parities, +1, -1 or 0 if not known"""
+        return np.array([0, 1, -1, 0], dtype='i1')[self.jpi >> JPI_PARITY_SHIFT & 3]
+
+    def has_modes(self, *modes):
+        """Mask of the nuclides decaying by any of the modes, names of
+        mode_names or OTHER_MODE for the modes outside them
+        """
+        bits = 0
+        for mode in modes:
+            if mode == OTHER_MODE:
+                bits |= 1 << self.other_mode_bit
+            elif mode in self.mode_names:
+                bits |= 1 << self.mode_names.index(mode)
+            else:
+                raise ValueError('Unknown decay mode {!r}, expected one of {} or {!r}'.format(
+                    mode, ', '.join(self.mode_names), OTHER_MODE))
+        return (self.modes & bits) != 0
+
+    def nuclides(self, mask):
+        """Nuclide ids (see nuclide_ids.py) of the nuclides in a mask of
+        the shape of the chart, in increasing Z and N
+        """
+        Z, N = np.nonzero(mask)
+        return nuclide_id(Z, Z + N)
+
+    def describe(self, Z, N):
+        """What the chart holds for the nuclide Z, N as a dict"""
+        bits = int(self.modes[Z, N])
+        modes = [mode for k, mode in enumerate(self.mode_names) if bits >> k & 1]
+        if bits >> self.other_mode_bit & 1:
+            modes.append(OTHER_MODE)
+        return {
+            'half_life': float(self.half_life[Z, N]),
+            'modes': modes,
+            'J': decode_jpi(int(self.jpi[Z, N])),
+            'has_data': bool(self.has_data[Z, N]),
+        }
+
+    def save(self, path):
+        """Saves the chart in the folder path, an .npy file per array"""
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        for name, _ in CHART_ARRAYS:
+            np.save(os.path.join(path, name + '.npy'), getattr(self, name))
+        with open(os.path.join(path, CHART_METADATA), 'w') as f:
+            json.dump({'mode_names': self.mode_names}, f)
+
+
+def load_nuclide_chart(path, mmap=True):
+    """Loads a chart saved with nuclide_chart.save, with its arrays
+    mapped into memory (read only) if mmap
+    """
+    with open(os.path.join(path, CHART_METADATA)) as f:
+        metadata = json.load(f)
+    arrays = [np.load(os.path.join(path, name + '.npy'), mmap_mode='r' if mmap else None)
+              for name, _ in CHART_ARRAYS]
+    return nuclide_chart(*arrays, **metadata)
+
+
+def chart_from_records(records):
+    """Builds the chart from the records of _chart_records. Decays of
+    excited parent levels (isomers) are left out.
+    """
+    half_lives, parent_half_lives, modes, spins = {}, {}, {}, {}
+    for record in records:
+        if record[0] == 'level':
+            _, Z, A, half_life = record
+            half_lives.setdefault((Z, A), half_life)
+        elif record[0] == 'adopted':
+            _, Z, A, J, branchings = record
+            spins.setdefault((Z, A), J)
+            for mode in branchings:
+                modes[(Z, A)] = modes.get((Z, A), 0) | mode_bit(mode)
+        elif record[0] == 'decay':
+            _, Z, A, energy, half_life, mode = record[:6]
+            if energy == 0:
+                modes[(Z, A)] = modes.get((Z, A), 0) | mode_bit(mode)
+                if half_life is not None:
+                    parent_half_lives.setdefault((Z, A), half_life)
+    for key, half_life in parent_half_lives.items():
+        half_lives.setdefault(key, half_life)
+
+    nuclides = set(spins) | set(modes)
+    shape = (max([Z for Z, A in nuclides] + [0]) + 1, max([A - Z for Z, A in nuclides] + [0]) + 1)
+    chart = nuclide_chart(*[np.zeros(shape, dtype=dtype) for _, dtype in CHART_ARRAYS])
+    chart.half_life[:] = np.nan
+    chart.jpi[:] = JPI_UNKNOWN
+    for (Z, A), half_life in half_lives.items():
+        if (Z, A) in nuclides:
+            chart.half_life[Z, A - Z] = half_life
+    for (Z, A), bits in modes.items():
+        chart.modes[Z, A - Z] = bits
+    for (Z, A), J in spins.items():
+        chart.jpi[Z, A - Z] = encode_jpi(J)
+    for Z, A in nuclides:
+        chart.has_data[Z, A - Z] = True
+    return chart
+
+
+def build_nuclide_chart(folder=ENSDF_folder, files=None, processes=None):
+    """Builds the chart of the ENSDF library in folder, parsed with a
+    pool of processes (see parse_library for the arguments)
+    """
+    results, _ = parse_library(folder, files, func=_chart_records, processes=processes, lazy=True)
+    return chart_from_records([record for datasets in results.values()
+                               for records in datasets for record in records])
+
+
+if __name__ == "__main__":
+    if sys.argv[1] == 'build':
+        folder, path = sys.argv[2:4]
+        chart = build_nuclide_chart(folder)
+        chart.save(path)
+        print('{} nuclides charted in {}'.format(int(chart.has_data.sum()), path))
+    else:
+        chart = load_nuclide_chart(sys.argv[1])
+        print('{} nuclides, {} with a half-life, {} stable'.format(
+            int(chart.has_data.sum()), int(np.isfinite(chart.half_life).sum()),
+            int(np.isinf(chart.half_life).sum())))
@@ -0,0 +1,92 @@
+"""Identity of the nuclides: lookup tables between element symbols and
+atomic numbers, parsing of the NUCIDs of the ENSDF records (mass number
+and element symbol, columns 1-5) and the canonical integer nuclide id
+used across the package:
+
+    id = Z * 10000 + A * 10 + m
+
+where m is the isomeric state (0 for the ground state), e.g. 270601
+for 60mCo.
+"""
+import re
+import numpy as np
+
+from nuclei_data import nuclide_data
+
+SYMBOLS = nuclide_data['symbols']
+ATOMIC_NUMBERS = dict((symbol.upper(), Z) for Z, symbol in enumerate(SYMBOLS))
+NUCID_RE = re.compile(r'\s*(\d{1,3})\s*([A-Za-z]{1,2}|\d{2})?\s*$')
+
+# Parsed NUCIDs, a library holds only a few thousand different ones
+NUCIDS = {}
+
+
+def atomic_number(symbol):
+    """Atomic number of the element symbol, in any case and with blanks
+    ignored. Elements without a symbol are written in ENSDF as Z - 100
+    (e.g. '10' for Z=110). Returns 0 for unknown symbols.
+    """
+    symbol = symbol.strip().upper()
+    try:
+        return ATOMIC_NUMBERS[symbol]
+    except KeyError:
+        return 100 + int(symbol) if symbol.isdigit() else 0
+
+def element_symbol(Z):
+    """Symbol of the element with atomic number Z"""
+    return SYMBOLS[Z] if Z < len(SYMBOLS) else str(Z - 100)
+
+
+def parse_nucid(nucid):
+    """Returns (A, Z) of a NUCID such as '129SM', ' 52FE ' or '60Ni',
+    with Z=0 for mass chain NUCIDs ('  60 ') and (0, 0) for anything
+    not a NUCID. Results are cached in NUCIDS.
+    """
+    try:
+        return NUCIDS[nucid]
+    except KeyError:
+        pass
+
+    match = NUCID_RE.match(nucid)
+    if match:
+        A = int(match.group(1))
+        Z = atomic_number(match.group(2)) if match.group(2) else 0
+    else:
+        A, Z = 0, 0
+    NUCIDS[nucid] = A, Z
+    return A, Z
+
+
+def nuclide_id(Z, A, m=0):
+    """Canonical id of the nuclide with atomic number Z and mass number
+    A in the isomeric state m. Works on arrays.
+    """
+    return Z * 10000 + A * 10 + m
+
+def nuclide_ZAm(nid):
+    """Inverse of nuclide_id, returns (Z, A, m). Works on arrays."""
+    return nid // 10000, nid // 10 % 1000, nid % 10
+
+def nucid_to_id(nucid, m=0):
+    """Canonical id of the nuclide of a NUCID"""
+    A, Z = parse_nucid(nucid)
+    return nuclide_id(Z, A, m)
+
+def nuclide_name(nid):
+    """Name of a nuclide id, e.g. '60Co' or '60mCo'"""
+    Z, A, m = nuclide_ZAm(int(nid))
+    return '{}{}{}'.format(A, 'm' if m == 1 else 'm{}'.format(m) if m else '', element_symbol(Z))
+
+
+def nucids_to_ids(nucids):
+    """Batch form of nucid_to_id, for a sequence or array of NUCIDs
+    (str or bytes, e.g. a column of a structured array). Each distinct
+    NUCID is parsed once. Returns an int32 array.
+    """
+    nucids = np.asarray(nucids)
+    if not nucids.size:
+        return np.zeros(nucids.shape, dtype='i4')
+    unique, inverse = np.unique(nucids, return_inverse=True)
+    ids = np.array([nucid_to_id(nucid.decode('latin-1') if isinstance(nucid, bytes) else nucid)
+                    for nucid in unique.tolist()], dtype='i4')
+    return ids[inverse].reshape(nucids.shape)
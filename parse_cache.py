@@ -0,0 +1,119 @@
+"""Persistent cache of parsed ENSDF files. The parsed datasets of a file
+are pickled and compressed into a cache folder next to the file, under
+a key made of the hash of the file content and of the parser version,
+so that loading an unchanged file skips the parsing altogether.
+"""
+import os
+import zlib
+import hashlib
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import my_ensdf_parser
+import syntax_presets
+import field_converters
+import nuclide_ids
+from my_ensdf_parser import iter_datasets
+
+CACHE_FOLDER = '.ensdf_cache'
+CACHE_MAX_SIZE = 2 ** 30  # bytes
+CACHE_EXTENSION = '.pkl.z'
+
+
+def _source_path(module):
+    path = module.__file__
+    return path[:-1] if path.endswith(('.pyc', '.pyo')) else path
+
+def parser_version(modules=(my_ensdf_parser, syntax_presets, field_converters, nuclide_ids)):
+    """Returns a hash of the source of the parser modules, which changes
+    whenever the syntax presets, field converters or parser change
+    """
+    sha = hashlib.sha1()
+    for module in modules:
+        with open(_source_path(module), 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()[:16]
+
+PARSER_VERSION = parser_version()
+
+
+def content_hash(path):
+    """Returns the SHA-1 hash of the content of the file"""
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2 ** 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def cache_folder(path):
+    """The cache folder used for the file path"""
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_FOLDER)
+
+def cache_entry(path, version=PARSER_VERSION, member=None, lazy=False):
+    """The path of the cache entry of the file path, parsed in lazy mode
+    or not, or of its member if path is an HDF5 file
+    """
+    options = ''.join(['-' + member.strip('/').replace('/', '.') if member else '',
+                       '-lazy' if lazy else ''])
+    name = '{}{}-{}{}'.format(content_hash(path), options, version, CACHE_EXTENSION)
+    return os.path.join(cache_folder(path), name)
+
+def _entries(folder):
+    if not os.path.isdir(folder):
+        return []
+    return [os.path.join(folder, name) for name in os.listdir(folder)
+            if name.endswith(CACHE_EXTENSION)]
+
+
+def load_datasets(path, max_size=CACHE_MAX_SIZE, member=None, lazy=False):
+    """Returns the list of parsed datasets of the ENSDF file path (or of
+    its member if an HDF5 file, see iter_dataset_strings), from the
+    cache if there is an entry for its content, parser version, member
+    and lazy mode, otherwise parsing the file and adding the entry to
+    the cache
+    """
+    if not isinstance(path, (str, type(u''))):
+        raise TypeError('The parse cache needs the path of a file, not {!r}'.format(path))
+    entry = cache_entry(path, member=member, lazy=lazy)
+    if os.path.exists(entry):
+        with open(entry, 'rb') as f:
+            datasets = pickle.loads(zlib.decompress(f.read()))
+        os.utime(entry, None)  # mark as recently used for the eviction
+        return datasets
+
+    datasets = list(iter_datasets(path, lazy=lazy, member=member))
+    folder = os.path.dirname(entry)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    tmp_entry = entry + '.tmp{}'.format(os.getpid())
+    with open(tmp_entry, 'wb') as f:
+        f.write(zlib.compress(pickle.dumps(datasets, pickle.HIGHEST_PROTOCOL)))
+    os.rename(tmp_entry, entry)
+
+    evict(folder, max_size)
+    return datasets
+
+
+def evict(folder, max_size=CACHE_MAX_SIZE):
+    """Removes the least recently used entries of the cache folder
+    until its total size is below max_size bytes
+    """
+    entries = sorted(_entries(folder), key=os.path.getmtime)
+    total = sum(os.path.getsize(entry) for entry in entries)
+    while entries and total > max_size:
+        entry = entries.pop(0)
+        total -= os.path.getsize(entry)
+        os.remove(entry)
+
+
+def invalidate(folder, version=PARSER_VERSION):
+    """Removes the entries of the cache folder made by parser versions
+    other than version, e.g. after changing syntax_presets.py or
+    field_converters.py. Use version=None to empty the cache.
+    """
+    suffix = '-{}{}'.format(version, CACHE_EXTENSION)
+    for entry in _entries(folder):
+        if version is None or not entry.endswith(suffix):
+            os.remove(entry)
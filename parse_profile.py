@@ -0,0 +1,307 @@
+"""Optional instrumentation of the parser, to find where the time of a
+parse goes. While a parse_profiler is enabled, the parsing functions
+of my_ensdf_parser (iter_dataset_strings, iter_datasets,
+classify_record(s), classify_dataset, parse_dsid, the methods of
+ensdf_file, dataset and record_group) and the field converters of the
+extraction plans are replaced by wrappers that count their calls and
+time them, and count the records of each type, the fields whose format
+did not match (regex misses) and the records of unknown type. Nothing
+is replaced while disabled, so the parser runs at full speed.
+
+    with parse_profiler() as profiler:
+        ef = ensdf_file('ensdf.060')
+    profiler.as_dict()
+    profiler.write_table('profile.csv')
+
+Stats are kept per file (named by the source being parsed). Times are
+inclusive: the time of dataset includes that of classify_record etc.
+"""
+import os
+import sys
+import csv
+from collections import Counter, OrderedDict
+from timeit import default_timer
+
+import my_ensdf_parser
+from my_ensdf_parser import EXTRACTION_PLANS, dataset, ensdf_file, record_group
+from field_converters import batch_converters
+
+# functions of my_ensdf_parser wrapped, in every module that imported them
+PROFILED_FUNCTIONS = ['iter_dataset_strings', 'iter_datasets', 'classify_record', 'classify_records',
+                      'classify_dataset', 'parse_dsid']
+STATS_COUNTERS = ['calls', 'seconds', 'records', 'record_seconds', 'misses']
+TABLE_COLUMNS = ['file', 'records', 'unknown_records', 'misses']
+
+_ACTIVE = [None]  # the enabled profiler, only one at a time
+
+
+def _new_stats():
+    stats = dict((name, Counter()) for name in STATS_COUNTERS)
+    stats['unknown_records'] = 0
+    return stats
+
+def active_profiler():
+    """The parse_profiler enabled, None if none"""
+    return _ACTIVE[0]
+
+def _source_name(source, member=None):
+    if isinstance(source, (str, type(u''))):
+        name = os.path.basename(source)
+        return '{}:{}'.format(name, member) if member else name
+    return str(getattr(source, 'name', ''))
+
+
+class parse_profiler(object):
+    """Counters and timers of the parsing stages, by file"""
+    def __init__(self):
+        self.files = OrderedDict()
+        self.file = ''
+        self._patches = []
+
+    @property
+    def enabled(self):
+        return _ACTIVE[0] is self
+
+    def stats(self):
+        """The stats of the file being parsed"""
+        try:
+            return self.files[self.file]
+        except KeyError:
+            stats = self.files[self.file] = _new_stats()
+            return stats
+
+    def _add(self, stage, elapsed, calls=1):
+        stats = self.stats()
+        stats['calls'][stage] += calls
+        stats['seconds'][stage] += elapsed
+
+    def _timed(self, stage, func):
+        profiler = self
+        def wrapper(*args, **kwargs):
+            t0 = default_timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler._add(stage, default_timer() - t0)
+        return wrapper
+
+    # wrappers of the functions and methods with more than timing
+
+    def _iterate(self, stage, source, member, iterator):
+        """Yields the items of iterator, timing each step as stage and
+        counting it in the stats of source
+        """
+        previous, self.file = self.file, _source_name(source, member)
+        try:
+            while True:
+                t0 = default_timer()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self._add(stage, default_timer() - t0, calls=0)
+                    break
+                self._add(stage, default_timer() - t0)
+                yield item
+        finally:
+            self.file = previous
+
+    def _wrap_iter_dataset_strings(self, func):
+        profiler = self
+        def iter_dataset_strings(source, member=None, start=0, stop=None):
+            return profiler._iterate('iter_dataset_strings', source, member,
+                                     func(source, member, start, stop))
+        return iter_dataset_strings
+
+    def _wrap_iter_datasets(self, func):
+        profiler = self
+        def iter_datasets(source, lazy=False, member=None, start=0, stop=None):
+            return profiler._iterate('iter_datasets', source, member,
+                                     func(source, lazy, member, start, stop))
+        return iter_datasets
+
+    def _wrap_classify_records(self, func):
+        profiler = self
+        def classify_records(record_strings):
+            t0 = default_timer()
+            record_types = func(record_strings)
+            profiler._add('classify_records', default_timer() - t0)
+            profiler.stats()['unknown_records'] += record_types.count(None)
+            return record_types
+        return classify_records
+
+    def _wrap_ensdf_file(self, func):
+        profiler = self
+        def __init__(self, ensdf, *args, **kwargs):
+            previous, profiler.file = profiler.file, _source_name(ensdf, kwargs.get('member'))
+            t0 = default_timer()
+            try:
+                func(self, ensdf, *args, **kwargs)
+            finally:
+                profiler._add('ensdf_file', default_timer() - t0)
+                profiler.file = previous
+        return __init__
+
+    def _wrap_record_group(self, func):
+        profiler = self
+        def __init__(self, record_string, recordstype=None, lazy=False, raw=None, span=None):
+            t0 = default_timer()
+            func(self, record_string, recordstype, lazy, raw, span)
+            profiler._add('record_group', default_timer() - t0)
+            stats = profiler.stats()
+            stats['records'][str(recordstype)] += 1
+            if recordstype is None:
+                stats['unknown_records'] += 1
+        return __init__
+
+    def _wrap_populate_data(self, func):
+        profiler = self
+        def _populate_data(self):
+            t0 = default_timer()
+            func(self)
+            elapsed = default_timer() - t0
+            profiler._add('populate_data', elapsed)
+            stats = profiler.stats()
+            stats['record_seconds'][str(self.type)] += elapsed
+
+            attributes, record_raw = self.__dict__, self.record_raw
+            for fieldname, i1, i2, search, converter in EXTRACTION_PLANS.get(self.type, ()):
+                if converter is not None and attributes.get(fieldname) is None:
+                    substring = record_raw[i1:i2]
+                    if substring and not substring.isspace():
+                        stats['misses']['{}.{}'.format(self.type, fieldname)] += 1
+        return _populate_data
+
+    # patching
+
+    def _patch(self, owner, name, value):
+        if isinstance(owner, dict):
+            self._patches.append((owner, name, owner.get(name)))
+            owner[name] = value
+        else:
+            original = owner.__dict__[name] if isinstance(owner, type) else getattr(owner, name)
+            self._patches.append((owner, name, original))
+            setattr(owner, name, value)
+
+    def enable(self):
+        """Installs the wrappers, see the module docstring"""
+        if _ACTIVE[0] is not None:
+            raise RuntimeError('A parse_profiler is already enabled')
+        _ACTIVE[0] = self
+
+        for name in PROFILED_FUNCTIONS:
+            original = getattr(my_ensdf_parser, name)
+            wrap = getattr(self, '_wrap_' + name, None)
+            wrapper = wrap(original) if wrap else self._timed(name, original)
+            for module in list(sys.modules.values()):
+                if module is not None and getattr(module, name, None) is original:
+                    self._patch(module, name, wrapper)
+
+        self._patch(ensdf_file, '__init__', self._wrap_ensdf_file(ensdf_file.__dict__['__init__']))
+        self._patch(dataset, '__init__', self._timed('dataset', dataset.__dict__['__init__']))
+        self._patch(record_group, '__init__', self._wrap_record_group(record_group.__dict__['__init__']))
+        self._patch(record_group, '_populate_data',
+                    self._wrap_populate_data(record_group.__dict__['_populate_data']))
+
+        # converters are referenced by the extraction plans, and the batch
+        # converters are looked up by them (see columnar_ensdf.py)
+        wrappers = {}
+        for rtype, plan in list(EXTRACTION_PLANS.items()):
+            entries = []
+            for fieldname, i1, i2, search, converter in plan:
+                if converter is not None:
+                    if converter not in wrappers:
+                        wrappers[converter] = self._timed('convert.' + converter.__name__, converter)
+                        batch = batch_converters.get(converter)
+                        if batch is not None:
+                            self._patch(batch_converters, wrappers[converter],
+                                        self._timed('convert.' + batch.__name__, batch))
+                    converter = wrappers[converter]
+                entries.append((fieldname, i1, i2, search, converter))
+            self._patch(EXTRACTION_PLANS, rtype, tuple(entries))
+        # the wrappers take plain numbers as they are, as the converters
+        plain = my_ensdf_parser.plain_number_converters
+        self._patch(my_ensdf_parser, 'plain_number_converters',
+                    plain + tuple(wrappers[converter] for converter in plain if converter in wrappers))
+
+    def disable(self):
+        """Removes the wrappers"""
+        for owner, name, original in reversed(self._patches):
+            if isinstance(owner, dict):
+                if original is None:
+                    del owner[name]
+                else:
+                    owner[name] = original
+            else:
+                setattr(owner, name, original)
+        self._patches = []
+        _ACTIVE[0] = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    # export
+
+    def merge(self, files):
+        """Adds the stats of files, a dict as as_dict()['files'] (e.g.
+        from a worker process)
+        """
+        for name, stats in files.items():
+            own = self.files.setdefault(name, _new_stats())
+            for counter in STATS_COUNTERS:
+                own[counter].update(stats[counter])
+            own['unknown_records'] += stats['unknown_records']
+
+    @staticmethod
+    def _sum(all_stats):
+        total = _new_stats()
+        for stats in all_stats:
+            for counter in STATS_COUNTERS:
+                total[counter].update(stats[counter])
+            total['unknown_records'] += stats['unknown_records']
+        return dict((name, dict(value) if isinstance(value, Counter) else value)
+                    for name, value in total.items())
+
+    def as_dict(self):
+        """The stats as plain dicts (ready for JSON): {'files': {file:
+        stats}, 'total': stats}, where stats holds the dicts 'calls' and
+        'seconds' by stage, 'records' and 'record_seconds' (time of
+        _populate_data) by record type, 'misses' by record type and field
+        and the number of 'unknown_records'
+        """
+        files = OrderedDict((name, dict((key, dict(value) if isinstance(value, Counter) else value)
+                                        for key, value in stats.items()))
+                            for name, stats in self.files.items())
+        return {'files': files, 'total': self._sum(self.files.values())}
+
+    def table(self):
+        """The stats as a table with a row per file (dicts with the
+        columns of table_columns)
+        """
+        rows = []
+        for name, stats in self.files.items():
+            row = {
+                'file': name,
+                'records': sum(stats['records'].values()),
+                'unknown_records': stats['unknown_records'],
+                'misses': sum(stats['misses'].values()),
+            }
+            for stage in stats['calls']:
+                row[stage + ' calls'] = stats['calls'][stage]
+                row[stage + ' seconds'] = stats['seconds'][stage]
+            rows.append(row)
+        return rows
+
+    def table_columns(self):
+        stages = sorted(set(stage for stats in self.files.values() for stage in stats['calls']))
+        return TABLE_COLUMNS + [stage + suffix for stage in stages for suffix in (' calls', ' seconds')]
+
+    def write_table(self, path):
+        """Writes the per file table as CSV"""
+        with open(path, 'w') as f:
+            writer = csv.DictWriter(f, self.table_columns(), restval=0)
+            writer.writeheader()
+            writer.writerows(self.table())
@@ -0,0 +1,209 @@
+"""Update of an HDF5 store (see hdf5_store.py) to a new ENSDF release,
+re-parsing only the datasets that changed. The datasets of both
+releases are matched by their identification (NUCID and DSID, in order
+of appearance for repeated ones) and compared by the hash of their
+text, so the new release is only split and hashed, not parsed, to find
+what changed. A changelog lists the datasets added, removed and
+modified, with the changes of the numeric fields of the modified ones.
+
+    python release_diff.py old.h5 new.h5 folder [changelog.json]
+"""
+import os
+import sys
+import json
+import numpy as np
+
+from my_ensdf_parser import ENSDF_folder, iter_dataset_strings
+from columnar_ensdf import columnar_dataset, record_dtype
+from library_parser import library_files
+from parse_cache import PARSER_VERSION
+from hdf5_store import (DATASET_COLUMNS, DATASET_TYPES, STORE_INDEX_COLUMNS, _append, _dataset_row,
+                        _record_columns, load_datasets_table, store_writer, table_name)
+
+
+def release_table(folder=ENSDF_folder, files=None):
+    """Datasets table (DATASET_COLUMNS rows, as in the store) of the
+    ENSDF release in folder, built without parsing the datasets
+    """
+    rows = []
+    for path in files or library_files(folder):
+        filename = os.path.basename(path)
+        for offset, dataset_string in iter_dataset_strings(path):
+            rows.append(_dataset_row(filename, offset, dataset_string))
+    return np.array(rows, dtype=DATASET_COLUMNS)
+
+
+def dataset_keys(table):
+    """Identification of the datasets of a datasets table, as tuples
+    (A, elem, DSID, k) where k counts the previous datasets with the
+    same A, elem and DSID
+    """
+    seen = {}
+    keys = []
+    for A, elem, dsid in zip(table['A'].tolist(), table['elem'].tolist(), table['DSID'].tolist()):
+        key = (A, elem, dsid)
+        seen[key] = seen.get(key, -1) + 1
+        keys.append(key + (seen[key],))
+    return keys
+
+
+def match_datasets(old, new):
+    """For each dataset of the datasets table new, returns the row of
+    the same dataset in the table old, or -1 if it is not there
+    """
+    old_rows = dict((key, k) for k, key in enumerate(dataset_keys(old)))
+    return np.array([old_rows.get(key, -1) for key in dataset_keys(new)], dtype='i8')
+
+
+def _describe(row):
+    return {
+        'file': row['file'].decode('latin-1'),
+        'nuclide': '{}{}'.format(row['A'], row['elem'].decode('latin-1')),
+        'DSID': row['DSID'].decode('latin-1'),
+        'type': DATASET_TYPES[row['type']],
+    }
+
+
+def _json_value(value):
+    if isinstance(value, complex):
+        return value.real if value.imag == 0 else str(value)
+    return None if np.isnan(value) else value
+
+
+def _field_deltas(rtype, old, new):
+    """Changes of the numeric fields between the records old and new of
+    a dataset, matched by position
+    """
+    deltas = []
+    for name in new.dtype.names:
+        if new.dtype[name].kind not in 'fc' or name not in old.dtype.names:
+            continue
+        old_values, new_values = old[name], new[name]
+        changed = ~((old_values == new_values) | (np.isnan(old_values) & np.isnan(new_values)))
+        for k in np.nonzero(changed)[0]:
+            old_value, new_value = old_values[k].item(), new_values[k].item()
+            deltas.append({
+                'record_type': rtype,
+                'record': int(k),
+                'field': name,
+                'old': _json_value(old_value),
+                'new': _json_value(new_value),
+                'delta': _json_value(new_value - old_value),
+            })
+    return deltas
+
+
+def _read_table(group, rtype):
+    """Reads a record table of the store, sorted by dataset"""
+    dtype = np.dtype(record_dtype(rtype).descr + STORE_INDEX_COLUMNS)
+    table = np.zeros(group['dataset'].shape[0], dtype=dtype)
+    for name in dtype.names:
+        table[name] = group[name][:]
+    return table[np.argsort(table['dataset'], kind='mergesort')]
+
+
+def update_store(old_h5path, new_h5path, folder=ENSDF_folder, files=None):
+    """Writes to new_h5path the store of the ENSDF release in folder
+    (see library_parser.py for files), copying from the store of the
+    previous release at old_h5path the records of the datasets that did
+    not change and parsing the rest. All datasets are parsed again if
+    the store was written by another version of the parser. Returns the
+    changelog, a dict with the lists of 'added', 'removed' and
+    'modified' datasets and the numbers of 'unchanged' and 'reparsed'.
+    """
+    import h5py
+
+    old = load_datasets_table(old_h5path)
+    if (old['hash'] == b'').any():
+        raise ValueError('The store {} has no dataset hashes, export it again'.format(old_h5path))
+    new = release_table(folder, files)
+    old_rows = match_datasets(old, new)
+
+    with h5py.File(old_h5path, 'r') as old_h5:
+        same_parser = old_h5.attrs.get('parser_version') == PARSER_VERSION
+        old_groups = dict((group.attrs['record_type'], group)
+                          for group in old_h5.get('records', {}).values())
+        old_types = dict((name if name != 'None' else None, group) for name, group in old_groups.items())
+
+        matched = old_rows >= 0
+        unchanged = matched.copy()
+        unchanged[matched] = old['hash'][old_rows[matched]] == new['hash'][matched]
+        modified = np.nonzero(matched & ~unchanged)[0]
+        copied = unchanged & same_parser
+
+        # the datasets not copied are parsed, read by seeking into their files
+        parsed = {}
+        for k in np.nonzero(~copied)[0]:
+            row = new[k]
+            path = os.path.join(folder, row['file'].decode('latin-1'))
+            with open(path, 'rb') as f:
+                f.seek(row['offset'])
+                dataset_string = f.read(row['length']).decode('latin-1')
+            parsed[k] = columnar_dataset(dataset_string, (path, row['offset']))
+
+        # new dataset index of each old dataset copied
+        copied_to = np.full(len(old), -1, dtype='i8')
+        copied_to[old_rows[copied]] = np.nonzero(copied)[0]
+
+        changelog = {
+            'added': [_describe(new[k]) for k in np.nonzero(~matched)[0]],
+            'removed': [_describe(old[k]) for k in sorted(set(range(len(old))) - set(old_rows[matched]))],
+            'modified': [dict(_describe(new[k]), records=[], deltas=[]) for k in modified],
+            'unchanged': int(unchanged.sum()),
+            'reparsed': len(parsed),
+        }
+
+        with h5py.File(new_h5path, 'w') as h5:
+            writer = store_writer(h5)
+            if len(new):
+                _append(h5.require_group('datasets'), new)
+            rtypes = set(old_types) | set(rtype for ds in parsed.values() for rtype in ds.tables)
+            for rtype in sorted(rtypes, key=str):
+                if rtype in old_types:
+                    old_table = _read_table(old_types[rtype], rtype)
+                else:
+                    old_table = np.zeros(0, dtype=record_dtype(rtype).descr + STORE_INDEX_COLUMNS)
+                kept = old_table[copied_to[old_table['dataset']] >= 0]
+                kept['dataset'] = copied_to[kept['dataset']]
+                parts = [kept]
+                tables = [(k, new[k], ds.tables[rtype]) for k, ds in sorted(parsed.items())
+                          if rtype in ds.tables]
+                if tables:
+                    parts.append(_record_columns(rtype, tables))
+
+                for entry, k in zip(changelog['modified'], modified):
+                    bounds = np.searchsorted(old_table['dataset'], [old_rows[k], old_rows[k] + 1])
+                    before = old_table[bounds[0]:bounds[1]]
+                    after = parsed[k].tables.get(rtype, before[:0])
+                    if len(before) != len(after):
+                        entry['records'].append({'record_type': rtype, 'old': len(before), 'new': len(after)})
+                    elif len(after):
+                        entry['deltas'].extend(_field_deltas(rtype, before, after))
+
+                columns = np.concatenate(parts)
+                if len(columns):
+                    columns = columns[np.argsort(columns['dataset'], kind='mergesort')]
+                    group = h5.require_group('records').require_group(table_name(rtype))
+                    group.attrs['record_type'] = str(rtype)
+                    _append(group, columns)
+            if 'records' in h5:
+                writer.write_indices()
+
+    return changelog
+
+
+def write_changelog(changelog, path):
+    """Writes the changelog of update_store as JSON"""
+    with open(path, 'w') as f:
+        json.dump(changelog, f, indent=1, sort_keys=True)
+
+
+if __name__ == "__main__":
+    old_h5path, new_h5path, folder = sys.argv[1:4]
+    changelog_path = sys.argv[4] if len(sys.argv) > 4 else 'changelog.json'
+
+    changelog = update_store(old_h5path, new_h5path, folder)
+    write_changelog(changelog, changelog_path)
+    print('{} added, {} removed, {} modified, {} unchanged datasets, see {}'.format(
+        len(changelog['added']), len(changelog['removed']), len(changelog['modified']),
+        changelog['unchanged'], changelog_path))
@@ -200,7 +200,9 @@ RECORD_MEMBERS = {
 # regular expressions since a field can have 
 # multiple formats which differ in character 
 # positioning (unlike records!).
-NUM = r'\d+[\d,\.,E,+,-]*'  # defined as unsigned number e.g. 345, 345.34, 23.E+9, etc
+# unsigned number e.g. 345, 345.34, .5, 23.E+9, etc, not starting
+# within another number (e.g. 2.3 in 1.2.3)
+NUM = r'(?<![\d\.])(?:\d+(?:\.\d*)?|\.\d+)(?:E[\+-]?\d+)?'
 # TODO: Check RTYPE field and similarity to RID
 FIELDS = {
     'RID'   : {
@@ -230,7 +232,7 @@ FIELDS = {
             r'ADOPTED LEVELS, GAMMAS'
         ],
         'DECAYS'                   : [
-            r'(?P<A>\d{1,3})(?P<Sym>\w{1,2})(\[\+\d{1,}\]){0,1} (?P<mode>[\w,+,-]*) DECAY( \()?(?P<T>[\d,\.,E,+,-]*){0,1}\s?(?P<U>[Y,D,H,M,U,N,K,P,A,F,S,E,V]{0,3})\)?',
+            r'(?P<A>\d{1,3})(?P<Sym>\w{1,2})(?P<isomer>\[\+\d{1,}\]){0,1} (?P<mode>[\w,+,-]*) DECAY( \()?(?P<T>[\d,\.,E,+,-]*){0,1}\s?(?P<U>[Y,D,H,M,U,N,K,P,A,F,S,E,V]{0,3})\)?',
             r'MUONIC ATOM'
         ],
         'REACTIONS'                : [
@@ -243,7 +245,7 @@ FIELDS = {
         r'\s*(?P<T>{}) (?P<U>[Y,D,H,M,U,N,K,P,A,F,S,E,V]{{0,3}})\s*'.format(NUM),
         ],
     'E'     : [
-        r'\s*([\+-]?SN|[\+-]?SP|[\+-]?[A-Z]|[\+-]?[\d.]+(?:E\+|E-|E)?\d*)([\+-]?SN|[\+-]?SP|[\+-]?[A-Z]|[\+-]?[\d.]+(?:E\+|E-|E)?\d*)?\s*',
+        r'\s*([\+-]?SN|[\+-]?SP|[\+-]?[A-Z]|[\+-]?{0})([\+-](?:SN|SP|[A-Z]|{0}))?\s*'.format(NUM),
         ],
 }
 
@@ -253,14 +255,14 @@ for key in ['BR','CC','HF','LOGFT','NB','NP','NR','NT','QP']:
 
 for key in ['DBR','DCC','DE','DHF','DIA','DIB','DIE','DIP','DNB','DNR','DNP','DNT','DQP','DQ_','DS','DSP','DTI']:
     # these are two-character fields
-    FIELDS[key] = [r'([\h*,\d*]{2})', 'LT', 'GT', 'LE', 'GE', 'AP', 'CA', 'SY']
+    FIELDS[key] = [r'(\d{1,2})', 'LT', 'GT', 'LE', 'GE', 'AP', 'CA', 'SY']
 
 for key in ['MR','Q_','QA','SN','SP']:
-    FIELDS[key] = [r'(-?{})'.format(NUM),]
+    FIELDS[key] = [r'([\+-]?{})'.format(NUM),]
 
 for key in ['DFT','DMR','DT','DNB','DQA']:
     # uncertainties, either asymmetric or symmetric
-    FIELDS[key] = [r'\+(\d+)\-(\d+)', r'([\h*,\d*]{2})', 'LT', 'GT', 'LE', 'GE', 'AP', 'CA', 'SY']
+    FIELDS[key] = [r'\+(\d+)\-(\d+)', r'(\d+)', 'LT', 'GT', 'LE', 'GE', 'AP', 'CA', 'SY']
 
 for key in ['IA','IB','IE','IP','RI','TI']:
     FIELDS[key] = [r'\(?({})\)?'.format(NUM),]
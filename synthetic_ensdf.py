@@ -0,0 +1,293 @@
+"""Generator of synthetic ENSDF files, to test and benchmark the parser
+without the ENSDF library. The records are written field by field at
+the columns of RECORD_MEMBERS, with values in the formats of FIELDS, so
+that the files pass the validator mode of the parser (validate_records).
+
+Each file is a mass chain: a REFERENCES dataset followed by ADOPTED
+LEVELS, DECAY and reaction datasets of the nuclides around the valley
+of stability. The size of the files and the mix of dataset and record
+types are tunable: the body of each dataset is drawn record by record
+from the weights of record_mix, so e.g. {'GAMMA': 10, 'LEVEL': 1}
+gives gamma-heavy datasets. Gamma energies are differences of level
+energies less the nuclear recoil, so that the gammas match their final
+levels as level_scheme.py finds them.
+"""
+import os
+import random
+from collections import OrderedDict
+
+from my_ensdf_parser import END_RECORD
+from level_scheme import AMU
+from syntax_presets import RECORD_MEMBERS, FIELDS
+from nuclide_ids import element_symbol
+
+DATASET_MIX = OrderedDict([
+    ('ADOPTED LEVELS', 1),
+    ('DECAYS',         2),
+    ('REACTIONS',      1),
+])
+RECORD_MIX = OrderedDict([
+    ('LEVEL',            20),
+    ('GAMMA',            30),
+    ('BETA MINUS',        3),
+    ('EC / BETA PLUS',    3),
+    ('ALPHA',             1),
+    ('DELAYED PARTICLE',  1),
+    ('COMMENT',          25),
+])
+RECORDS_PER_DATASET = 200
+
+# record types of the emissions of each decay mode, other than gammas
+MODE_RECORDS = {
+    'B-' : ['BETA MINUS', 'DELAYED PARTICLE'],
+    'EC' : ['EC / BETA PLUS', 'DELAYED PARTICLE'],
+    'A'  : ['ALPHA'],
+    'IT' : [],
+}
+# parent (Z, A) offsets of each decay mode
+MODE_PARENTS = {'B-': (-1, 0), 'EC': (1, 0), 'A': (2, 4), 'IT': (0, 0)}
+REACTIONS = ['(HI,XNG)', 'COULOMB EXCITATION', '(P,N)', '(D,P)', '(N,G) E=THERMAL', '(A,2NG)']
+
+SPINS = ['0+', '1+', '2+', '3-', '4+', '(5-)', '1/2-', '3/2+', '5/2+', '(7/2-)']
+TIME_UNITS = ['FS', 'PS', 'NS', 'US', 'MS', 'S', 'M', 'H', 'D', 'Y']
+MULTIPOLARITIES = ['E1', 'M1', 'E2', 'M1+E2', 'E2+M1', 'E3', '[E1]', 'D+Q']
+COMMENT_TEXTS = ['From 1978AL17', 'Other: 1332.6 keV 5 (1980MO12)', '$Weighted average of all data',
+                 'Deduced by the evaluator from the gamma-ray branching', 'From {+60}Ni(T,P)']
+
+
+def nucid(A, Z=None):
+    """NUCID (columns 1-5) of the nuclide (A, Z), or of the mass chain A
+    if Z is None
+    """
+    return '{:>3}{:<2}'.format(A, element_symbol(Z).upper() if Z is not None else '')
+
+def format_record(rtype, fields, continuation=' '):
+    """80 character record (without line feed) of type rtype with the
+    values of fields (a dict of strings by field name of RECORD_MEMBERS)
+    left justified in their columns. The record identifier (columns
+    6-8) is taken from FIELDS['RID'] unless given in fields.
+    """
+    members = RECORD_MEMBERS[rtype]
+    rid = FIELDS['RID'].get(rtype, '   ')
+    values = {'Additional': continuation, 'RID': rid[1:]}
+    values.update(fields)
+
+    chars = [' '] * 80
+    for name, value in values.items():
+        i1, i2 = members[name]
+        if len(value) > i2 - i1 + 1:
+            raise ValueError('{!r} does not fit in the field {} of {} records'.format(value, name, rtype))
+        chars[i1 - 1:i1 - 1 + len(value)] = value
+    return ''.join(chars)
+
+
+def _number(rng, low, high, digits=4):
+    return '{:.{}G}'.format(rng.uniform(low, high), digits)
+
+def _uncertainty(rng):
+    return str(rng.randint(1, 25))
+
+def _half_life(rng):
+    return '{} {}'.format(_number(rng, 1, 999, 3), rng.choice(TIME_UNITS))
+
+def _energy(value):
+    return '{:.3f}'.format(value).rstrip('0').rstrip('.') if value else '0.0'
+
+def _gamma_energy(transition, A):
+    """Energy of the gamma of a transition between levels of a nucleus of
+    mass number A, Eg = transition - Eg^2 / 2Mc^2 (the nuclear recoil)
+    """
+    mass = AMU * A
+    return mass * ((1 + 2 * transition / mass)**.5 - 1)
+
+
+class _dataset_builder(object):
+    """Writes the records of one synthetic dataset"""
+    def __init__(self, rng, A, Z):
+        self.rng = rng
+        self.A, self.Z = A, Z
+        self.nucid = nucid(A, Z)
+        self.levels = []
+        self.lines = []
+        self.Q = rng.uniform(2000, 9000)
+
+    def add(self, rtype, fields, nucid=None, continuation=' '):
+        fields = dict(fields, NUCID=nucid or self.nucid) if 'NUCID' in RECORD_MEMBERS[rtype] else fields
+        self.lines.append(format_record(rtype, fields, continuation))
+
+    def identification(self, dsid):
+        self.add('IDENTIFICATION', {'DSID': dsid, 'DSREF': '1978AL17', 'PUB': '13NDS', 'DATE': '201307'})
+        self.add('HISTORY', {'History': 'TYP=FUL$AUT=E. BROWNE, J. K. TULI$CIT=NDS 114, 1849 (2013)$'})
+        if self.rng.random() < .5:
+            self.add('HISTORY', {'History': 'CUT=1-Mar-2013$'}, continuation='2')
+
+    def q_value(self):
+        rng = self.rng
+        self.add('Q-VALUE', {'Q_': '-' + _number(rng, 100, 9000, 6), 'DQ_': _uncertainty(rng),
+                             'SN': _number(rng, 5000, 12000, 6), 'DSN': _uncertainty(rng),
+                             'SP': _number(rng, 5000, 12000, 5), 'DSP': _uncertainty(rng),
+                             'QA': '-' + _number(rng, 100, 9000, 5), 'DQA': _uncertainty(rng),
+                             'QREF': '2012WA38'})
+
+    def parent(self, pA, pZ, mode):
+        rng = self.rng
+        self.add('PARENT', {'E': '0.0', 'J': rng.choice(SPINS), 'T': _half_life(rng), 'DT': _uncertainty(rng),
+                            'QP': _number(rng, 1000, 9000, 6), 'DQP': _uncertainty(rng)}, nucid=nucid(pA, pZ))
+        self.add('NORMALIZATION', {'NR': '1.0', 'NT': '1.0', 'BR': '1.0', 'NB': '1.0'})
+
+    def comment(self, rtype=None):
+        flag = FIELDS['RID'][rtype][-1] if rtype in FIELDS['RID'] else ' '
+        self.add('COMMENT', {'RID': 'c' + flag, 'CTEXT': self.rng.choice(COMMENT_TEXTS)})
+
+    def level(self):
+        rng = self.rng
+        energy = self.levels[-1] + rng.uniform(10, 500) if self.levels else 0.
+        self.levels.append(round(energy, 3))
+        fields = {'E': _energy(energy), 'J': rng.choice(SPINS)}
+        if energy:
+            fields.update({'DE': _uncertainty(rng), 'T': _half_life(rng), 'DT': _uncertainty(rng)})
+        else:
+            fields['T'] = 'STABLE'
+        self.add('LEVEL', fields)
+
+    def gamma(self):
+        rng = self.rng
+        if len(self.levels) < 2:
+            return
+        final = self.levels[rng.randrange(len(self.levels) - 1)]
+        self.add('GAMMA', {'E': _energy(_gamma_energy(self.levels[-1] - final, self.A)),
+                           'DE': _uncertainty(rng),
+                           'RI': _number(rng, 0.01, 100), 'DRI': _uncertainty(rng),
+                           'M': rng.choice(MULTIPOLARITIES), 'MR': '+' + _number(rng, 0.01, 5, 2),
+                           'DMR': _uncertainty(rng), 'CC': _number(rng, 1e-4, 1, 2)})
+
+    def beta(self, rtype):
+        rng = self.rng
+        endpoint = self.Q - self.levels[-1]
+        if endpoint <= 0:
+            return
+        fields = {'E': _energy(endpoint), 'DE': _uncertainty(rng), 'IB': _number(rng, 0.01, 100),
+                  'DIB': _uncertainty(rng), 'LOGFT': _number(rng, 4, 9, 3), 'DFT': _uncertainty(rng)}
+        if rtype == 'EC / BETA PLUS':
+            fields.update({'IE': _number(rng, 0.01, 100), 'DIE': _uncertainty(rng)})
+        self.add(rtype, fields)
+
+    def alpha(self):
+        rng = self.rng
+        self.add('ALPHA', {'E': _energy(rng.uniform(4000, 8000)), 'DE': _uncertainty(rng),
+                           'IA': _number(rng, 0.01, 100), 'DIA': _uncertainty(rng),
+                           'HF': _number(rng, 1, 500, 3), 'DHF': _uncertainty(rng)})
+
+    def delayed_particle(self):
+        rng = self.rng
+        self.add('DELAYED PARTICLE', {'E': _energy(rng.uniform(100, 3000)), 'DE': _uncertainty(rng),
+                                      'IP': _number(rng, 0.01, 100), 'DIP': _uncertainty(rng)})
+
+    def body(self, n_records, record_types, record_mix):
+        rng = self.rng
+        types = [rtype for rtype in record_mix if rtype in record_types]
+        weights = [record_mix[rtype] for rtype in types]
+        self.level()
+        while len(self.lines) < n_records:
+            rtype = _weighted_choice(rng, types, weights)
+            if rtype == 'LEVEL':
+                self.level()
+            elif rtype == 'GAMMA':
+                self.gamma()
+            elif rtype in ('BETA MINUS', 'EC / BETA PLUS'):
+                self.beta(rtype)
+            elif rtype == 'ALPHA':
+                self.alpha()
+            elif rtype == 'DELAYED PARTICLE':
+                self.delayed_particle()
+            elif rtype == 'COMMENT':
+                self.comment(rng.choice(['LEVEL', 'GAMMA', None]))
+        return self.lines
+
+
+def _weighted_choice(rng, items, weights):
+    threshold = rng.uniform(0, sum(weights))
+    for item, weight in zip(items, weights):
+        threshold -= weight
+        if threshold <= 0:
+            return item
+    return items[-1]
+
+def _stable_Z(A):
+    """Atomic number of the valley of stability for the mass number A"""
+    return int(round(A / (1.98 + 0.0155 * A**(2. / 3))))
+
+
+def synthetic_dataset(rng, A, kind, n_records=RECORDS_PER_DATASET, record_mix=RECORD_MIX):
+    """Lines (80 character strings) of a synthetic dataset of mass
+    number A and type kind (a key of DATASET_MIX or 'REFERENCES'), with
+    about n_records records, drawn with the generator rng
+    """
+    Z = max(1, _stable_Z(A) + rng.randint(-2, 2))
+    if kind == 'REFERENCES':
+        lines = [format_record('IDENTIFICATION', {'NUCID': nucid(A), 'DSID': 'REFERENCES',
+                                                  'PUB': '13NDS', 'DATE': '201307'})]
+        lines += [format_record('REFERENCE', {'MASS_NUMBER': '{:>3}'.format(A)}) for _ in range(5)]
+        return lines
+
+    builder = _dataset_builder(rng, A, Z)
+    if kind == 'DECAYS':
+        mode = rng.choice(sorted(MODE_PARENTS))
+        dZ, dA = MODE_PARENTS[mode]
+        pZ, pA = Z + dZ, A + dA
+        dsid = '{}{} {} DECAY ({})'.format(pA, element_symbol(pZ).upper(), mode, _half_life(rng))
+        builder.identification(dsid)
+        builder.parent(pA, pZ, mode)
+        record_types = ['LEVEL', 'GAMMA', 'COMMENT'] + MODE_RECORDS[mode]
+    else:
+        builder.identification('ADOPTED LEVELS, GAMMAS' if kind == 'ADOPTED LEVELS'
+                               else '{}{}{}'.format(A - 2, element_symbol(Z - 1).upper(), rng.choice(REACTIONS)))
+        if kind == 'ADOPTED LEVELS':
+            builder.q_value()
+        record_types = ['LEVEL', 'GAMMA', 'COMMENT']
+    return builder.body(n_records, record_types, record_mix)
+
+
+def synthetic_ensdf(size, A=None, dataset_mix=DATASET_MIX, record_mix=RECORD_MIX,
+                    records_per_dataset=RECORDS_PER_DATASET, seed=0):
+    """Text of a synthetic ENSDF file of about size bytes.
+
+    Arguments:
+    ---------
+    size: {int} size of the file in bytes, reached by adding datasets
+    A: {int} mass number of the file, drawn from seed if None
+    dataset_mix: {dict} weights of the dataset types, keys of DATASET_MIX
+    record_mix: {dict} weights of the record types in the dataset bodies
+    records_per_dataset: {int} mean number of records of the datasets
+    seed: {int} seed of the random generator, the same seed gives the same file
+    """
+    rng = random.Random(seed)
+    A = A or rng.randint(20, 250)
+    kinds = list(dataset_mix)
+    weights = [dataset_mix[kind] for kind in kinds]
+
+    datasets = [synthetic_dataset(rng, A, 'REFERENCES')]
+    length = len(END_RECORD) * (len(datasets[0]) + 1)
+    while length < size:
+        n_records = rng.randint(records_per_dataset // 2, records_per_dataset * 3 // 2)
+        lines = synthetic_dataset(rng, A, _weighted_choice(rng, kinds, weights), n_records, record_mix)
+        datasets.append(lines)
+        length += len(END_RECORD) * (len(lines) + 1)
+
+    return ''.join('\n'.join(lines) + '\n' + END_RECORD for lines in datasets)
+
+
+def write_synthetic_library(folder, n_files, size, seed=0, **kwargs):
+    """Writes n_files synthetic ENSDF files of about size bytes each
+    (ensdf.001, ensdf.002...) to folder, see synthetic_ensdf for the
+    keyword arguments. Returns the paths of the files.
+    """
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    paths = []
+    for k in range(1, n_files + 1):
+        path = os.path.join(folder, 'ensdf.{:03d}'.format(k))
+        with open(path, 'w') as f:
+            f.write(synthetic_ensdf(size, A=k, seed=seed + k, **kwargs))
+        paths.append(path)
+    return paths
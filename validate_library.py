@@ -0,0 +1,76 @@
+"""Validation of the whole ENSDF library (the files ensdf.001 to
+ensdf.298 in a folder) with the validator mode of the parser, spread
+over a pool of processes, and report of the problems found as JSON or
+CSV. Run as a script it exits with status 1 if there are problems, so
+that it can be used as a check on new ENSDF releases:
+
+    python validate_library.py [folder] [report.json|report.csv]
+"""
+import os
+import sys
+import csv
+import json
+from multiprocessing import Pool
+
+from my_ensdf_parser import ENSDF_folder, validate_records
+from library_parser import library_files
+
+REPORT_COLUMNS = ['file', 'line', 'record_type', 'field', 'reason', 'record']
+REPORT_FILENAME = 'Report_faulty_records.json'
+
+
+def validate_file(path):
+    """Returns the report rows (dicts with REPORT_COLUMNS keys) of the
+    problems found in the ENSDF file
+    """
+    filename = os.path.basename(path)
+    return [dict(zip(REPORT_COLUMNS, (filename,) + problem))
+            for problem in validate_records(path)]
+
+
+def validate_library(folder=ENSDF_folder, files=None, processes=None):
+    """Validates the ENSDF files of a library with a pool of processes
+    (see parse_library for the arguments). Returns the report rows of
+    all the files, in the order of the files and lines.
+    """
+    if files is None:
+        files = library_files(folder)
+
+    # largest files first, so that they do not end up last in the pool
+    tasks = sorted(files, key=os.path.getsize, reverse=True)
+    if processes == 1:
+        outputs = [validate_file(path) for path in tasks]
+    else:
+        pool = Pool(processes)
+        try:
+            outputs = pool.map(validate_file, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    by_path = dict(zip(tasks, outputs))
+    return [row for path in files for row in by_path[path]]
+
+
+def write_report(rows, path=REPORT_FILENAME):
+    """Writes the report rows to path, as CSV if its extension is .csv
+    and as a JSON list of objects otherwise
+    """
+    if path.endswith('.csv'):
+        with open(path, 'w') as f:
+            writer = csv.DictWriter(f, REPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, 'w') as f:
+            json.dump(rows, f, indent=1)
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else ENSDF_folder
+    report_path = sys.argv[2] if len(sys.argv) > 2 else REPORT_FILENAME
+
+    rows = validate_library(folder)
+    write_report(rows, report_path)
+    print('{} problems found in {}, see {}'.format(len(rows), folder, report_path))
+    sys.exit(1 if rows else 0)